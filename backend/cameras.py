@@ -0,0 +1,253 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import cv2
+
+from backend import number_plate_recognition
+from backend.metrics import STAGE_SECONDS, FRAMES_SKIPPED
+
+logger = logging.getLogger(__name__)
+
+ENTRY = "entry"
+EXIT = "exit"
+
+class CameraConfig:
+    def __init__(self, name: str, source, role: str, buffer_size: int = 16, frame_stride: int = 1,
+                 realtime: Optional[bool] = None, plate_region: Optional[List[int]] = None,
+                 imgsz: Optional[int] = None) -> None:
+        """
+        One gate camera.
+
+        Args:
+            name (str): Unique camera name.
+            source: Video file path, stream URL or local camera index.
+            role (str): "entry" or "exit"; decides which database event a read plate produces.
+            buffer_size (int): Frames buffered while inference is behind; the oldest are dropped beyond this.
+            frame_stride (int): Only every `frame_stride`-th frame is buffered.
+            realtime (Optional[bool]): Pace file sources at their native fps, as a live camera would
+                deliver them. Defaults to True for files and False for streams.
+            plate_region (Optional[List[int]]): [x1, y1, x2, y2] band where plates appear in this
+                camera's view; plate detection only looks there. Defaults to the full frame.
+            imgsz (Optional[int]): Plate model input size for this camera, e.g. 320 with a narrow region.
+        """
+        if role not in (ENTRY, EXIT):
+            raise ValueError(f"Camera {name}: role must be '{ENTRY}' or '{EXIT}', not {role!r}")
+        self.name = name
+        self.source = int(source) if isinstance(source, str) and source.isdigit() else source
+        self.role = role
+        self.buffer_size = buffer_size
+        self.frame_stride = max(1, frame_stride)
+        self.is_file = isinstance(self.source, str) and Path(self.source).is_file()
+        self.realtime = self.is_file if realtime is None else realtime
+        self.plate_region = plate_region
+        self.imgsz = imgsz
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CameraConfig":
+        return cls(**data)
+
+class CameraStream:
+    def __init__(self, config: CameraConfig) -> None:
+        """Reads one camera on its own thread into a bounded, drop-oldest frame buffer."""
+        self.config = config
+        self.detector = number_plate_recognition.PlateDetector(conf_threshold=0.85, region=config.plate_region,
+                                                               imgsz=config.imgsz)
+        self.buffer = deque(maxlen=config.buffer_size)  # (capture time, frame)
+        self.busy = False  # a worker holds this camera, keeping its frames in order
+        self.ended = False
+        self.recent_plates = {}  # number_plate -> last time it produced an event
+        self.stats = {"state": "starting", "frames_read": 0, "frames_dropped": 0, "frames_processed": 0,
+                      "vehicles": 0, "lag_seconds": 0.0, "last_frame_at": None, "error": None}
+        self._thread = None
+
+    def start(self, stop: threading.Event, wake: threading.Condition) -> None:
+        self._thread = threading.Thread(target=self._run, args=(stop, wake), name=f"camera-{self.config.name}", daemon=True)
+        self._thread.start()
+
+    def join(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, stop: threading.Event, wake: threading.Condition) -> None:
+        cap = cv2.VideoCapture(self.config.source)
+        if not cap.isOpened():
+            self.stats.update(state="error", error=f"Could not open source: {self.config.source}")
+            self.ended = True
+            return
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_interval = 1.0 / fps if self.config.realtime else 0.0
+        self.stats["state"] = "running"
+        index = 0
+        next_frame_at = time.monotonic()
+        try:
+            while not stop.is_set():
+                if index % self.config.frame_stride:
+                    if not cap.grab():
+                        break
+                    FRAMES_SKIPPED.inc()
+                else:
+                    with STAGE_SECONDS.time(stage="frame_decode"):
+                        ret, frame = cap.read()
+                    if not ret:
+                        break
+                    now = time.monotonic()
+                    with wake:
+                        if len(self.buffer) == self.buffer.maxlen:
+                            self.stats["frames_dropped"] += 1  # behind: the oldest frame falls out
+                        self.buffer.append((now, frame))
+                        self.stats["frames_read"] += 1
+                        self.stats["last_frame_at"] = time.time()
+                        wake.notify()
+                index += 1
+                if frame_interval:
+                    next_frame_at += frame_interval
+                    time.sleep(max(0.0, next_frame_at - time.monotonic()))
+        except Exception as e:
+            self.stats.update(state="error", error=str(e))
+        finally:
+            cap.release()
+            with wake:
+                self.ended = True
+                if self.stats["state"] == "running":
+                    self.stats["state"] = "ended"
+                wake.notify_all()
+
+class CameraManager:
+    def __init__(self, configs: List[CameraConfig], on_vehicle: Callable[[str, str, str], None],
+                 workers: int = 2, batch_size: int = 4, repeat_window: float = 30.0) -> None:
+        """
+        Runs many gate cameras through the plate pipeline on a shared pool of worker threads.
+
+        Workers take cameras in round-robin order, one batch at a time, so a busy camera
+        cannot starve the others, and a camera is only ever held by one worker so its
+        tracker sees frames in order. YOLO and OCR each run under their own lock (the
+        models are not thread-safe), which lets one camera's OCR overlap another's detection.
+
+        Args:
+            configs (List[CameraConfig]): Cameras to run.
+            on_vehicle: Called with (camera name, role, number plate) once per vehicle read.
+            workers (int): Worker threads shared by all cameras.
+            batch_size (int): Frames per camera per turn (one YOLO call).
+            repeat_window (float): Seconds during which the same plate on the same camera
+                does not produce another event.
+        """
+        names = [config.name for config in configs]
+        if len(set(names)) != len(names):
+            raise ValueError("Camera names must be unique")
+        self.cameras = {config.name: CameraStream(config) for config in configs}
+        self.on_vehicle = on_vehicle
+        self.workers = workers
+        self.batch_size = batch_size
+        self.repeat_window = repeat_window
+        self._order = deque(self.cameras)
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._inference_lock = threading.Lock()
+        self._ocr_lock = threading.Lock()
+        self._threads = []
+
+    @classmethod
+    def from_config_file(cls, path, on_vehicle, **kwargs) -> "CameraManager":
+        """Builds a manager from a JSON file: {"cameras": [{"name", "source", "role", ...}, ...]}."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls([CameraConfig.from_dict(camera) for camera in data["cameras"]], on_vehicle, **kwargs)
+
+    def start(self) -> None:
+        self._stop.clear()
+        for camera in self.cameras.values():
+            camera.start(self._stop, self._wake)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"camera-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        for camera in self.cameras.values():
+            camera.join()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _next_task(self):
+        """Waits for the next camera in round-robin order with work to do and claims it."""
+        with self._wake:
+            while not self._stop.is_set():
+                for _ in range(len(self._order)):
+                    name = self._order[0]
+                    self._order.rotate(-1)
+                    camera = self.cameras[name]
+                    if camera.busy:
+                        continue
+                    if camera.buffer:
+                        camera.busy = True
+                        batch = [camera.buffer.popleft() for _ in range(min(self.batch_size, len(camera.buffer)))]
+                        return camera, batch
+                    if camera.ended and camera.detector is not None:
+                        camera.busy = True
+                        return camera, None  # drained and finished: flush its tracks
+                if all(camera.ended and camera.detector is None for camera in self.cameras.values()):
+                    return None
+                self._wake.wait(timeout=0.5)
+        return None
+
+    def _work(self) -> None:
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            camera, batch = task
+            try:
+                if batch is None:
+                    tracks = camera.detector.finish()
+                    camera.detector = None
+                else:
+                    with self._inference_lock:
+                        camera.detector.process_batch([frame for _, frame in batch], stop_when_full=False)
+                    camera.stats["frames_processed"] += len(batch)
+                    camera.stats["lag_seconds"] = time.monotonic() - batch[-1][0]
+                    tracks = camera.detector.pop_finalized()
+                for track in tracks:
+                    self._report(camera, track)
+            except Exception as e:
+                camera.stats["error"] = str(e)
+                logger.error("Error processing camera %s: %s", camera.config.name, e)
+            finally:
+                with self._wake:
+                    camera.busy = False
+                    self._wake.notify_all()
+
+    def _report(self, camera: CameraStream, track) -> None:
+        with self._ocr_lock:
+            number_plate = number_plate_recognition.vote_plate_text(track.top_plates())
+        if not number_plate:
+            return
+        now = time.monotonic()
+        if len(camera.recent_plates) > 1024:
+            camera.recent_plates = {plate: seen for plate, seen in camera.recent_plates.items()
+                                    if now - seen < self.repeat_window}
+        last_seen = camera.recent_plates.get(number_plate)
+        camera.recent_plates[number_plate] = now
+        if last_seen is not None and now - last_seen < self.repeat_window:
+            return
+        camera.stats["vehicles"] += 1
+        try:
+            self.on_vehicle(camera.config.name, camera.config.role, number_plate)
+        except Exception as e:
+            logger.error("Error recording %s for %s on %s: %s", camera.config.role, number_plate, camera.config.name, e)
+
+    def stats(self) -> dict:
+        """Per-camera health, buffer and lag statistics."""
+        report = {}
+        for name, camera in self.cameras.items():
+            report[name] = {"role": camera.config.role, "source": str(camera.config.source),
+                            "buffered": len(camera.buffer), **camera.stats}
+        return report
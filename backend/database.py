@@ -1,98 +1,436 @@
+import base64
+import logging
 import sqlite3
+import threading
+import time
+from contextlib import nullcontext
 from pathlib import Path
 from datetime import datetime
 
+from backend import plates, rollups
+from backend.db_pool import ConnectionPool
+from backend.metrics import DB_SECONDS
+
+logger = logging.getLogger(__name__)
+
 DATABASE_DIR = Path(__file__).resolve().parent.parent / "database"
 DATABASE_FILE = DATABASE_DIR / "parking.db"
+POOL_SIZE = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Plates of open sessions for fuzzy exit matching; loaded on first use and kept in
+# sync by the helpers below (writes from other processes are not seen until restart)
+_open_sessions = None
+_open_sessions_lock = threading.Lock()
 
 def create_connection():
-    """Creates a database connection."""
+    """Creates a standalone database connection (prefer `connection()` for pooled access)."""
     DATABASE_DIR.mkdir(parents=True, exist_ok=True)
     conn = None
     try:
         conn = sqlite3.connect(DATABASE_FILE)
-        print(f"Connected to SQLite database: {DATABASE_FILE}")
+        logger.debug("Connected to SQLite database: %s", DATABASE_FILE)
     except sqlite3.Error as e:
-        print(f"Error connecting to database: {e}")
+        logger.error("Error connecting to database: %s", e)
     return conn
 
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                DATABASE_DIR.mkdir(parents=True, exist_ok=True)
+                _pool = ConnectionPool(DATABASE_FILE, size=POOL_SIZE)
+                logger.info("Connection pool ready for SQLite database: %s", DATABASE_FILE)
+    return _pool
+
+def connection():
+    """Checks out a pooled connection: `with database.connection() as conn: ...`"""
+    return get_pool().connection()
+
+def close_pool():
+    """Closes the connection pool (called on application shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    global _open_sessions
+    _open_sessions = None
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def to_epoch(value=None):
+    """Converts a datetime, 'YYYY-MM-DD HH:MM:SS' string or epoch (number or digits) to integer epoch seconds (now if None)."""
+    if value is None:
+        return int(time.time())
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if value.isdigit():
+        return int(value)  # epoch seconds passed as text, e.g. from a query string
+    return int(datetime.strptime(value, TIME_FORMAT).timestamp())
+
+def format_epoch(epoch):
+    """Formats integer epoch seconds as a local 'YYYY-MM-DD HH:MM:SS' string."""
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch).strftime(TIME_FORMAT)
+
+def record_from_row(row):
+    """Converts a parking_records row into a dict with formatted times."""
+    return {'id': row[0], 'number_plate': row[1], 'entry_time': format_epoch(row[2]),
+            'exit_time': format_epoch(row[3]), 'slot_number': row[4]}
+
+def _migration_create_parking_records(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parking_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            number_plate TEXT NOT NULL,
+            entry_time TEXT NOT NULL,
+            exit_time TEXT,
+            slot_number INTEGER
+        );
+    """)
+
+def _migration_epoch_times(conn):
+    # SQLite cannot change a column type in place, so rebuild the table. Old rows
+    # hold local-time text, which the 'utc' modifier converts to true epoch seconds.
+    conn.execute("""
+        CREATE TABLE parking_records_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            number_plate TEXT NOT NULL,
+            entry_time INTEGER NOT NULL,
+            exit_time INTEGER,
+            slot_number INTEGER
+        );
+    """)
+    conn.execute("""
+        INSERT INTO parking_records_new (id, number_plate, entry_time, exit_time, slot_number)
+        SELECT id, number_plate,
+               CASE WHEN typeof(entry_time) = 'integer' THEN entry_time
+                    ELSE CAST(strftime('%s', entry_time, 'utc') AS INTEGER) END,
+               CASE WHEN typeof(exit_time) = 'integer' THEN exit_time
+                    ELSE CAST(strftime('%s', exit_time, 'utc') AS INTEGER) END,
+               slot_number
+        FROM parking_records;
+    """)
+    conn.execute("DROP TABLE parking_records;")
+    conn.execute("ALTER TABLE parking_records_new RENAME TO parking_records;")
+
+def _migration_session_indexes(conn):
+    # Open sessions are looked up by plate on every exit; the partial index only
+    # holds vehicles currently inside, so it stays small as history grows.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parking_records_open_plate
+        ON parking_records (number_plate, entry_time) WHERE exit_time IS NULL;
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parking_records_entry_time
+        ON parking_records (entry_time);
+    """)
+
+def _migration_history_indexes(conn):
+    # History queries filter by plate and page through (entry_time, id); the
+    # entry_time index already ends in the rowid, so only the plate needs one.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parking_records_plate_entry_time
+        ON parking_records (number_plate, entry_time);
+    """)
+
+def _migration_rollup_tables(conn):
+    # Hourly/daily aggregates kept up to date on every entry and exit; seeded from
+    # the existing history so dashboards never have to scan parking_records.
+    rollups.create_tables(conn)
+    rollups.backfill(conn)
+
+def _migration_local_hour_rollups(conn):
+    # Hourly buckets used to start on UTC hours; rebuild them on local hours, like the days
+    rollups.backfill(conn)
+
+def _migration_normalize_plates(conn):
+    # Plates used to be stored as read ("KA 01 AB 1234"); lookups now compare normalized plates
+    updates = []
+    for record_id, plate in conn.execute("SELECT id, number_plate FROM parking_records").fetchall():
+        normalized = plates.normalize_plate(plate)
+        if normalized and normalized != plate:
+            updates.append((normalized, record_id))
+    conn.executemany("UPDATE parking_records SET number_plate = ? WHERE id = ?", updates)
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    _migration_create_parking_records,
+    _migration_epoch_times,
+    _migration_session_indexes,
+    _migration_history_indexes,
+    _migration_rollup_tables,
+    _migration_local_hour_rollups,
+    _migration_normalize_plates,
+]
+
 def create_tables():
-    """Creates the parking_records table."""
-    conn = create_connection()
-    if conn is not None:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS parking_records (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    number_plate TEXT NOT NULL,
-                    entry_time TEXT NOT NULL,
-                    exit_time TEXT,
-                    slot_number INTEGER
-                );
-            """)
-            conn.commit()
-            print("Parking records table created successfully.")
-        except sqlite3.Error as e:
-            print(f"Error creating table: {e}")
-        finally:
-            conn.close()
+    """Creates the parking tables and applies any pending schema migrations."""
+    try:
+        with connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target in range(version + 1, len(MIGRATIONS) + 1):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    MIGRATIONS[target - 1](conn)
+                    conn.execute(f"PRAGMA user_version = {target}")
+                    conn.commit()
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+                logger.info("Applied database migration %d: %s", target, MIGRATIONS[target - 1].__name__)
+            logger.info("Parking records table is up to date.")
+    except sqlite3.Error as e:
+        logger.error("Error creating table: %s", e)
 
+@DB_SECONDS.time(operation="insert_parking_record")
 def insert_parking_record(number_plate, entry_time=None):
-    """Inserts a new parking record into the database."""
-    conn = create_connection()
-    if conn is not None:
-        try:
+    """Inserts a new parking record into the database and returns its id."""
+    number_plate = plates.normalize_plate(number_plate)
+    try:
+        with connection() as conn:
             cursor = conn.cursor()
-            if entry_time is None:
-                entry_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Use current time if not provided
-            cursor.execute("INSERT INTO parking_records (number_plate, entry_time) VALUES (?, ?)", (number_plate, entry_time))
+            entry_epoch = to_epoch(entry_time)  # Use current time if not provided
+            cursor.execute("INSERT INTO parking_records (number_plate, entry_time) VALUES (?, ?)", (number_plate, entry_epoch))
+            rollups.record_entry(conn, entry_epoch)  # commits together with the record
             conn.commit()
-            print(f"Parking record inserted for {number_plate} at {entry_time}")
-        except sqlite3.Error as e:
-            print(f"Error inserting parking record: {e}")
-        finally:
-            conn.close()
-
-def update_parking_record(number_plate, exit_time=None):
-    """Updates the exit_time for an existing parking record."""
-    conn = create_connection()
-    if conn is not None:
-        try:
+            logger.debug("Parking record inserted for %s at %s", number_plate, entry_epoch)
+            open_session_index(conn).add(cursor.lastrowid, number_plate)
+            return cursor.lastrowid
+    except sqlite3.Error as e:
+        logger.error("Error inserting parking record: %s", e)
+        return None
+
+@DB_SECONDS.time(operation="update_parking_record")
+def update_parking_record(number_plate, exit_time=None, record_id=None):
+    """
+    Sets the exit_time on the open parking session for a number plate.
+    Only that single session is closed; pass `record_id` when it is already known.
+    """
+    number_plate = plates.normalize_plate(number_plate)
+    try:
+        with connection() as conn:
             cursor = conn.cursor()
-            if exit_time is None:
-                exit_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Use current time if not provided
-            cursor.execute("UPDATE parking_records SET exit_time = ? WHERE number_plate = ?", (exit_time, number_plate))
+            exit_epoch = to_epoch(exit_time)  # Use current time if not provided
+            if record_id is None:
+                cursor.execute("""
+                    SELECT id FROM parking_records
+                    WHERE number_plate = ? AND exit_time IS NULL
+                    ORDER BY entry_time DESC, id DESC LIMIT 1
+                """, (number_plate,))
+                row = cursor.fetchone()
+                if row is None:
+                    logger.warning("No open parking record for %s", number_plate)
+                    return False
+                record_id = row[0]
+            cursor.execute("UPDATE parking_records SET exit_time = ? WHERE id = ? AND exit_time IS NULL", (exit_epoch, record_id))
+            if cursor.rowcount == 1:
+                entry_epoch = conn.execute("SELECT entry_time FROM parking_records WHERE id = ?", (record_id,)).fetchone()[0]
+                rollups.record_exit(conn, entry_epoch, exit_epoch)  # commits together with the exit
             conn.commit()
-            print(f"Parking record updated for {number_plate} with exit time {exit_time}")
-        except sqlite3.Error as e:
-            print(f"Error updating parking record: {e}")
-        finally:
-            conn.close()
+            open_session_index(conn).remove(record_id)
+            logger.debug("Parking record updated for %s with exit time %s", number_plate, exit_epoch)
+            return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        logger.error("Error updating parking record: %s", e)
+        return False
 
+@DB_SECONDS.time(operation="get_entry_record")
 def get_entry_record(number_plate):
     """
     Retrieves the entry record for a given number plate from the database.
-    Returns the record with the given number plate that has an entry time but no exit time.
+    Returns the most recent record with the given number plate that has an entry time but no exit time.
+    Plates are compared normalized, so "KA 01 AB 1234" finds "KA01AB1234".
     """
-    conn = create_connection()
-    if conn is not None:
-        try:
+    number_plate = plates.normalize_plate(number_plate)
+    try:
+        with connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM parking_records WHERE number_plate = ? AND exit_time IS NULL", (number_plate,))
+            cursor.execute("""
+                SELECT * FROM parking_records
+                WHERE number_plate = ? AND exit_time IS NULL
+                ORDER BY entry_time DESC, id DESC LIMIT 1
+            """, (number_plate,))
             row = cursor.fetchone()
             if row:
-                return {'id': row[0], 'number_plate': row[1], 'entry_time': row[2], 'exit_time': row[3], 'slot_number': row[4]}
+                return record_from_row(row)
             else:
                 return None
-        except sqlite3.Error as e:
-            print(f"Error retrieving entry record: {e}")
+    except sqlite3.Error as e:
+        logger.error("Error retrieving entry record: %s", e)
+        return None
+
+@DB_SECONDS.time(operation="set_slot_number")
+def set_slot_number(record_id, slot_number):
+    """Records the slot assigned to a parking session; returns True if the record exists."""
+    try:
+        with connection() as conn:
+            cursor = conn.execute("UPDATE parking_records SET slot_number = ? WHERE id = ?", (slot_number, record_id))
+            conn.commit()
+            return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        logger.error("Error assigning slot %s to record %s: %s", slot_number, record_id, e)
+        return False
+
+def get_open_slot_assignments():
+    """Maps slot number -> record id for every open session holding a slot."""
+    with connection() as conn:
+        rows = conn.execute("""
+            SELECT slot_number, id FROM parking_records
+            WHERE exit_time IS NULL AND slot_number IS NOT NULL
+        """).fetchall()
+    return dict(rows)
+
+def open_session_index(conn=None):
+    """
+    The in-memory PlateIndex of open sessions. The app builds it at startup; if it is
+    needed before that, it is built on first use with `conn`, so a caller that already
+    holds a pooled connection never waits on a second one.
+    """
+    global _open_sessions
+    index = _open_sessions
+    if index is None:
+        with _open_sessions_lock:
+            if _open_sessions is None:
+                index = plates.PlateIndex()
+                with nullcontext(conn) if conn is not None else connection() as conn:
+                    index.replace_all(conn.execute("SELECT id, number_plate FROM parking_records WHERE exit_time IS NULL"))
+                _open_sessions = index
+            index = _open_sessions
+    return index
+
+@DB_SECONDS.time(operation="find_open_session")
+def find_open_session(number_plate, max_distance=plates.DEFAULT_MAX_DISTANCE):
+    """
+    Like get_entry_record, but tolerant of OCR errors: when no open session has exactly
+    this plate, the closest one within `max_distance` (see plates.ocr_distance) is returned.
+    """
+    record = get_entry_record(number_plate)
+    if record is not None:
+        return record
+    try:
+        match = open_session_index().lookup(number_plate, max_distance)
+        if match is None:
             return None
-        finally:
-            conn.close()
+        with connection() as conn:
+            row = conn.execute("SELECT * FROM parking_records WHERE id = ? AND exit_time IS NULL", (match[0],)).fetchone()
+    except sqlite3.Error as e:
+        logger.error("Error retrieving entry record: %s", e)
+        return None
+    if row is None:
+        open_session_index().remove(match[0])  # closed by another process
+        return None
+    logger.info("Matched plate %s to open session %s (distance %d)", number_plate, row[1], match[2])
+    return record_from_row(row)
+
+OPEN = "open"
+CLOSED = "closed"
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(entry_epoch, record_id):
+    """Opaque page cursor pointing just past the given row."""
+    return base64.urlsafe_b64encode(f"{entry_epoch}:{record_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor."""
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        entry_epoch, record_id = text.split(":")
+        return int(entry_epoch), int(record_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def _history_query(number_plate=None, since=None, until=None, state=None, after=None, descending=True):
+    """
+    Builds the SELECT for a history query. Rows are ordered by (entry_time, id) and
+    `after` is the (entry_time, id) keyset of the last row already seen, so each page
+    is an index range scan however deep it is.
+    """
+    clauses, params = [], []
+    if number_plate is not None:
+        clauses.append("number_plate = ?")
+        params.append(plates.normalize_plate(number_plate))
+    if since is not None:
+        clauses.append("entry_time >= ?")
+        params.append(to_epoch(since))
+    if until is not None:
+        clauses.append("entry_time < ?")
+        params.append(to_epoch(until))
+    if state == OPEN:
+        clauses.append("exit_time IS NULL")
+    elif state == CLOSED:
+        clauses.append("exit_time IS NOT NULL")
+    elif state is not None:
+        raise ValueError(f"state must be '{OPEN}' or '{CLOSED}', not {state!r}")
+    if after is not None:
+        clauses.append("(entry_time, id) < (?, ?)" if descending else "(entry_time, id) > (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    direction = "DESC" if descending else "ASC"
+    sql = f"SELECT * FROM parking_records {where} ORDER BY entry_time {direction}, id {direction}"
+    return sql, params
+
+@DB_SECONDS.time(operation="list_parking_records")
+def list_parking_records(number_plate=None, since=None, until=None, state=None, cursor=None, limit=100):
+    """
+    Returns one page of parking history, newest entry first, and the cursor of the next
+    page (None on the last page). Raises ValueError for bad filters or cursors.
+
+    Args:
+        number_plate (Optional[str]): Only this plate.
+        since, until: Entry time range [since, until), as accepted by to_epoch.
+        state (Optional[str]): "open" (still inside) or "closed".
+        cursor (Optional[str]): next_cursor of the previous page.
+        limit (int): Page size, at most MAX_PAGE_SIZE.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+    sql, params = _history_query(number_plate, since, until, state, after)
+    with connection() as conn:
+        # One extra row tells whether another page exists without a COUNT(*)
+        rows = conn.execute(f"{sql} LIMIT ?", params + [limit + 1]).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][2], rows[limit - 1][0]) if len(rows) > limit else None
+    return [record_from_row(row) for row in rows[:limit]], next_cursor
+
+def iter_parking_records(number_plate=None, since=None, until=None, state=None, batch_size=1000):
+    """
+    Returns a generator of lists of up to `batch_size` history records, oldest entry
+    first, for exports. Bad filters raise ValueError here, before anything is read.
+
+    The rows come from a single SQLite cursor stepped with fetchmany, so memory stays
+    constant however many rows match. A slow download can hold the cursor for minutes,
+    so it reads on a dedicated read-only connection rather than a pooled one; that
+    connection (and its WAL read snapshot) is closed when the generator ends.
+    """
+    sql, params = _history_query(number_plate, since, until, state, descending=False)
+    return _iter_batches(sql, params, batch_size)
+
+def _read_only_connection():
+    # Stepped from whichever threadpool thread serves the next chunk, one at a time
+    return sqlite3.connect(f"{DATABASE_FILE.as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+def _iter_batches(sql, params, batch_size):
+    conn = _read_only_connection()
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [record_from_row(row) for row in rows]
+    finally:
+        conn.close()
 
 # Example usage (optional):
 if __name__ == "__main__":
     create_tables()
     insert_parking_record("MH 12 AB 1234")
-    update_parking_record("MH 12 AB 1234")
\ No newline at end of file
+    update_parking_record("MH 12 AB 1234")
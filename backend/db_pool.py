@@ -0,0 +1,105 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Applied to every connection when it is opened. WAL lets readers run while a
+# writer commits, and NORMAL sync is durable enough for WAL mode.
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),  # negative = KiB, so ~16 MB page cache per connection
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+    ("foreign_keys", "ON"),
+)
+
+class ConnectionPool:
+    def __init__(self, database, size: int = 4, timeout: float = 30.0,
+                 cached_statements: int = 256, pragmas=DEFAULT_PRAGMAS) -> None:
+        """
+        Bounded pool of long-lived SQLite connections.
+
+        Connections are opened lazily (up to `size`), configured once with
+        `pragmas`, and reused for the lifetime of the process. Each connection
+        keeps its own prepared-statement cache of `cached_statements` entries.
+
+        Args:
+            database: Path of the SQLite database file.
+            size (int): Maximum number of open connections.
+            timeout (float): Seconds to wait for a free connection before giving up.
+            cached_statements (int): Size of each connection's statement cache.
+            pragmas: Sequence of (name, value) pragmas applied on open.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.database = str(database)
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.pragmas = tuple(pragmas)
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            check_same_thread=False,  # connections move between threads, never shared concurrently
+            cached_statements=self.cached_statements,
+        )
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Checks out a connection, opening a new one if the pool is not yet full."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                conn = self._open()
+                self._created += 1
+                return conn
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Timed out after {self.timeout}s waiting for a database connection"
+            ) from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Returns a connection to the pool, rolling back any transaction left open."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks a connection out and always returns it."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Closes every idle connection; busy ones are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
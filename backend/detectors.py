@@ -0,0 +1,282 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TORCH = "torch"
+ONNX = "onnx"
+BACKENDS = (TORCH, ONNX)
+FP32 = "fp32"
+INT8 = "int8"
+PRECISIONS = (FP32, INT8)
+
+# Chosen once per process from the environment (job worker processes inherit it)
+DETECTOR_BACKEND = os.environ.get("PARKING_DETECTOR_BACKEND", TORCH)
+DETECTOR_PRECISION = os.environ.get("PARKING_DETECTOR_PRECISION", FP32)
+
+DEFAULT_IMGSZ = 640
+STRIDE = 32  # YOLOv8 input sides must be multiples of the largest stride
+PAD_VALUE = 114  # letterbox padding, as ultralytics uses
+
+def detector_threads() -> Optional[int]:
+    """
+    Inference threads from PARKING_DETECTOR_THREADS, read when a detector is loaded.
+    None (the runtime's default) when unset, 0, or invalid; an invalid value is logged
+    rather than raised, so a typo cannot keep the models from loading.
+    """
+    value = os.environ.get("PARKING_DETECTOR_THREADS", "").strip()
+    if not value:
+        return None
+    try:
+        threads = int(value)
+    except ValueError:
+        threads = -1
+    if threads < 0:
+        logger.error("Invalid PARKING_DETECTOR_THREADS %r (expected a non-negative integer); "
+                     "using the runtime's default thread count", value)
+        return None
+    return threads or None
+
+class _HostArray:
+    """Stands in for a torch tensor already on the host: `.cpu().numpy()` returns the array."""
+    def __init__(self, array: np.ndarray) -> None:
+        self._array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self._array
+
+class Boxes:
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> None:
+        """Detections of one image, exposed like ultralytics' Boxes so callers need not care about the backend."""
+        self.xyxy = _HostArray(xyxy)
+        self.conf = _HostArray(conf)
+        self.cls = _HostArray(cls)
+
+class Result:
+    def __init__(self, boxes: Boxes, orig_shape: Tuple[int, int]) -> None:
+        self.boxes = boxes
+        self.orig_shape = orig_shape
+
+def letterbox(img: np.ndarray, shape: Tuple[int, int]) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Resizes `img` to fit (height, width) keeping its aspect ratio and pads the rest.
+
+    Returns:
+        Tuple of (padded image, scale factor, (left, top) padding).
+    """
+    height, width = img.shape[:2]
+    gain = min(shape[0] / height, shape[1] / width)
+    new_width, new_height = int(round(width * gain)), int(round(height * gain))
+    pad_x, pad_y = (shape[1] - new_width) / 2, (shape[0] - new_height) / 2
+    if (new_width, new_height) != (width, height):
+        img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(PAD_VALUE,) * 3)
+    return img, gain, (left, top)
+
+def input_shape(img_shape, imgsz: int) -> Tuple[int, int]:
+    """
+    Network input (height, width) for an image: the long side scaled to `imgsz` and the
+    short side only padded up to the stride, as ultralytics does for PyTorch models.
+    A 16:9 frame then costs about 40% less than a square input.
+    """
+    height, width = img_shape[:2]
+    gain = min(imgsz / height, imgsz / width)
+    return (int(np.ceil(height * gain / STRIDE)) * STRIDE, int(np.ceil(width * gain / STRIDE)) * STRIDE)
+
+def decode(output: np.ndarray, gain: float, pad: Tuple[int, int], orig_shape: Tuple[int, int],
+           conf: float, iou: float, max_det: int) -> Result:
+    """
+    Turns one image's raw YOLOv8 output, (4 + classes, anchors) with xywh boxes in input
+    pixels, into a Result in original-image pixels after class-aware NMS.
+    """
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    candidates = np.flatnonzero(scores > conf)
+    xywh = predictions[candidates, :4]
+    scores, classes = scores[candidates].astype(np.float32), classes[candidates].astype(np.int32)
+    # NMSBoxesBatched takes top-left based (x, y, w, h)
+    corners = np.column_stack([xywh[:, 0] - xywh[:, 2] / 2, xywh[:, 1] - xywh[:, 3] / 2, xywh[:, 2], xywh[:, 3]])
+    keep = np.asarray(cv2.dnn.NMSBoxesBatched(corners, scores, classes, conf, iou, top_k=max_det),
+                      dtype=np.intp).reshape(-1)
+
+    xyxy = corners[keep].copy()
+    xyxy[:, 2:] += xyxy[:, :2]
+    xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad[0]) / gain).clip(0, orig_shape[1])
+    xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad[1]) / gain).clip(0, orig_shape[0])
+    return Result(Boxes(xyxy.astype(np.float32), scores[keep], classes[keep].astype(np.float32)), orig_shape)
+
+class OnnxDetector:
+    def __init__(self, path, threads: Optional[int] = None, conf: float = 0.25, iou: float = 0.7,
+                 max_det: int = 300) -> None:
+        """
+        Runs an exported YOLOv8 model on ONNX Runtime's CPU provider, without importing
+        torch or ultralytics. Called like an ultralytics YOLO model and returns results
+        with the same `boxes.xyxy / conf / cls` interface.
+
+        Args:
+            path: Path of the .onnx file (see `export`).
+            threads (Optional[int]): Intra-op threads; the runtime uses every core by default.
+            conf (float): Default confidence threshold, as ultralytics' predict.
+            iou (float): Default NMS IoU threshold, as ultralytics' predict.
+            max_det (int): Maximum detections per image.
+        """
+        import onnxruntime as ort  # optional dependency, only needed for this backend
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = Path(path)
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Symbolic (string) dimensions were exported as dynamic
+        batch, _, height, width = model_input.shape
+        self.batch_size = batch if isinstance(batch, int) else None
+        self.fixed_shape = (height, width) if isinstance(height, int) and isinstance(width, int) else None
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+
+    def __call__(self, frames, verbose: bool = False, imgsz: Optional[int] = None, conf: Optional[float] = None,
+                 iou: Optional[float] = None, **kwargs) -> List[Result]:
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        imgsz = int(np.ceil((imgsz or DEFAULT_IMGSZ) / STRIDE)) * STRIDE
+        conf = self.conf if conf is None else conf
+        iou = self.iou if iou is None else iou
+
+        # Frames of the same input shape share one session run (a whole batch of camera frames or tiles)
+        groups = {}
+        for index, frame in enumerate(frames):
+            shape = self.fixed_shape or input_shape(frame.shape, imgsz)
+            groups.setdefault(shape, []).append(index)
+        results = [None] * len(frames)
+        for shape, indices in groups.items():
+            step = self.batch_size or len(indices)
+            for start in range(0, len(indices), step):
+                chunk = indices[start:start + step]
+                boxed = [letterbox(frames[index], shape) for index in chunk]
+                # BGR HWC uint8 -> RGB CHW float in [0, 1]
+                batch = np.stack([img[..., ::-1].transpose(2, 0, 1) for img, _, _ in boxed])
+                batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+                outputs = self.session.run(None, {self.input_name: batch})[0]
+                for index, output, (_, gain, pad) in zip(chunk, outputs, boxed):
+                    results[index] = decode(output, gain, pad, frames[index].shape[:2], conf, iou, self.max_det)
+        return results
+
+def artifact_path(source, precision: str = FP32) -> Path:
+    """Where the exported model for `source` weights is cached: an "onnx" directory next to them."""
+    source = Path(source)
+    return source.parent / "onnx" / f"{source.stem}-{precision}.onnx"
+
+def _stamp(source: Path, precision: str) -> dict:
+    stat = source.stat()
+    return {"source": source.name, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "precision": precision}
+
+def _is_current(target: Path, source: Path, precision: str) -> bool:
+    stamp_path = target.with_suffix(".json")
+    if not target.exists() or not stamp_path.exists():
+        return False
+    if not source.exists():
+        return True  # shipped without the PyTorch weights: the artifact is all there is
+    try:
+        return json.loads(stamp_path.read_text()) == _stamp(source, precision)
+    except (OSError, ValueError):
+        return False
+
+def export(source, precision: str = FP32, force: bool = False) -> Path:
+    """
+    Converts YOLO weights to ONNX once and caches the result (see `artifact_path`).
+    The cached file is reused until the source weights change (size or mtime) or `force`
+    is set. Exporting needs ultralytics (and torch); only running the artifact does not.
+
+    INT8 models are dynamically quantized from the FP32 export: weights are stored as
+    8-bit and activations quantized on the fly, so no calibration set is needed.
+
+    Returns:
+        Path: The .onnx artifact.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {', '.join(PRECISIONS)}, not {precision!r}")
+    source = Path(source)
+    target = artifact_path(source, precision)
+    if not force and _is_current(target, source, precision):
+        return target
+    if not source.exists():
+        raise FileNotFoundError(f"No weights to export and no cached ONNX model: {source}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    if precision == FP32:
+        from ultralytics import YOLO
+        logger.info("Exporting %s to ONNX", source)
+        # Dynamic axes, so one artifact serves any batch size and input size (tiles, plate crops)
+        exported = YOLO(str(source)).export(format="onnx", dynamic=True, simplify=True, imgsz=DEFAULT_IMGSZ)
+        os.replace(exported, target)
+    else:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        fp32 = export(source, FP32, force=force)
+        logger.info("Quantizing %s to INT8", fp32)
+        # ONNX Runtime's CPU ConvInteger kernel only takes unsigned 8-bit weights
+        quantize_dynamic(str(fp32), str(target), weight_type=QuantType.QUInt8)
+
+    target.with_suffix(".json").write_text(json.dumps(_stamp(source, precision)))
+    logger.info("Cached %s", target)
+    return target
+
+def load_onnx(source, precision: str = FP32, threads: Optional[int] = None) -> OnnxDetector:
+    """Loads the cached ONNX export of `source` weights, exporting it first if needed."""
+    detector = OnnxDetector(export(source, precision), threads=threads)
+    logger.info("Running %s on ONNX Runtime (%s, %s threads)", Path(source).name, precision, threads or "default")
+    return detector
+
+def main(argv=None) -> int:
+    from backend import log
+    from backend.model_registry import DETECTOR_PATHS
+
+    parser = argparse.ArgumentParser(description="Export the YOLO detectors to cached ONNX models for CPU inference.")
+    parser.add_argument("models", nargs="*", metavar="MODEL",
+                        help=f"Models to export (default: all): {', '.join(DETECTOR_PATHS)}.")
+    parser.add_argument("--precision", action="append", help=f"One of {', '.join(PRECISIONS)}; repeatable (default: both).")
+    parser.add_argument("--force", action="store_true", help="Re-export even if the cached model is current.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.models if name not in DETECTOR_PATHS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+    precisions = args.precision or list(PRECISIONS)
+    unknown = [precision for precision in precisions if precision not in PRECISIONS]
+    if unknown:
+        parser.error(f"unknown precision(s): {', '.join(unknown)}")
+
+    log.configure()
+    status = 0
+    for name in args.models or list(DETECTOR_PATHS):
+        for precision in precisions:
+            try:
+                path = export(DETECTOR_PATHS[name], precision, force=args.force)
+            except (OSError, ImportError) as e:
+                print(f"{name} ({precision}): export failed: {e}")
+                status = 1
+                continue
+            print(f"{name} ({precision}): {path}")
+    return status
+
+if __name__ == "__main__":
+    # One-time conversion on a machine with torch installed: python -m backend.detectors
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
+
+from backend import log, metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at its depth limit."""
+
+def _init_worker():
+    """Runs once in every worker process so models are loaded before the first job arrives."""
+    log.configure()
+    try:
+        from backend.model_registry import registry
+        registry.warmup(["plate_detector", "plate_ocr"])
+    except Exception as e:
+        # Raising here would break the whole pool; let the job itself report the failure instead
+        logger.error("Error preloading models in worker: %s", e)
+
+def read_plates(video_path: str):
+    """Worker entry point: reads every vehicle's number plate from a video file, one entry per vehicle."""
+    from backend import number_plate_recognition
+    return number_plate_recognition.extract_number_plates(video_path)
+
+def read_plates_from_frames(images: list):
+    """Worker entry point: reads every vehicle from uploaded still frames (encoded bytes), in order."""
+    from backend import number_plate_recognition, uploads
+    frames = [uploads.decode_image(image) for image in images]
+    return number_plate_recognition.extract_number_plates_from_frames(frames)
+
+def read_plates_from_clip(clip: bytes):
+    """Worker entry point: reads every vehicle from an uploaded video clip, decoded from memory."""
+    from backend import number_plate_recognition, uploads
+    with uploads.open_clip(clip) as cap:
+        return number_plate_recognition.extract_number_plates(cap)
+
+def _run_job(fn, *args):
+    """
+    Runs a job in a worker process. Metrics recorded in the worker are returned with the
+    result, since the API process serves /metrics; a failed job's metrics go with the next one.
+    """
+    result = fn(*args)
+    return result, metrics.drain()
+
+class Job:
+    def __init__(self, kind: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobQueue:
+    def __init__(self, max_workers: int = 1, max_pending: int = 8, max_finished: int = 256) -> None:
+        """
+        Runs blocking vision work in a pool of worker processes.
+
+        Args:
+            max_workers (int): Number of worker processes (each holds its own models).
+            max_pending (int): Queued plus running jobs allowed before submissions are rejected.
+            max_finished (int): Finished jobs kept around for status queries.
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts the worker processes; they begin loading models immediately."""
+        if self._executor is not None:
+            return
+        # spawn avoids forking a parent that may already hold torch/paddle threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # Submitting a no-op per worker forces the processes (and their initializers) to start now
+        for _ in range(self.max_workers):
+            self._executor.submit(time.sleep, 0)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, kind: str, fn, *args, on_result=None) -> Job:
+        """
+        Queues `fn(*args)` for a worker process and returns immediately.
+
+        `on_result` is called in the API process with the worker's return value;
+        whatever it returns becomes the job result, and any exception it raises
+        marks the job as failed.
+        """
+        if self._executor is None:
+            self.start()
+        job = Job(kind)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+            try:
+                job.future = self._executor.submit(_run_job, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); replace the pool and retry once
+                self._executor = None
+                self.start()
+                job.future = self._executor.submit(_run_job, fn, *args)
+            self._jobs[job.id] = job
+            self._pending += 1
+        job.future.add_done_callback(lambda future: self._finish(job, future, on_result))
+        return job
+
+    def _finish(self, job: Job, future, on_result) -> None:
+        try:
+            value, deltas = future.result()
+            metrics.merge(deltas)  # the work was done even if the job was cancelled meanwhile
+            if job.status == CANCELLED:
+                return  # cancelled while running: drop the result and skip side effects
+            job.result = on_result(value) if on_result is not None else value
+            job.status = DONE
+        except CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+                self._evict_finished()
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str):
+        """
+        Returns the job, or None. A job reads as running once the pool has handed it to a
+        worker; the pool hands out calls ahead of time, so it may still be waiting there.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and job.status == QUEUED and job.future.running():
+            job.status = RUNNING
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job. A job still in the pool's queue never runs. A job already handed
+        to a worker (running, or waiting in the worker's call queue, which the pool fills
+        ahead of time) cannot be stopped: it runs to completion, its result is discarded,
+        and the job's error says so.
+        Returns False if the job is unknown or already finished.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.finished_at is not None:
+            return False
+        job.status = CANCELLED
+        if not job.future.cancel():
+            job.error = "Cancelled after it was handed to a worker; it runs to completion but its result is discarded"
+        return True
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from backend.occupancy import OccupancyEngine
+from backend.tiling import TilingConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAYOUT = "default"
+DEFAULT_LAYOUT_PATH = Path(__file__).resolve().parent / "parking_layout.json"
+
+# Optional directory of per-camera layouts: each <name>.json is served as ?layout=<name>
+# (a default.json there replaces the built-in default layout)
+LAYOUT_DIR = os.environ.get("PARKING_LAYOUT_DIR")
+
+def slot_number(slot_id) -> int:
+    """
+    Numeric slot number from a layout slot id such as "slot12". Ids without exactly one
+    run of digits (e.g. "A1-03") are ambiguous and raise ValueError; such slots need an
+    explicit "number" in the layout.
+    """
+    numbers = re.findall(r"\d+", str(slot_id))
+    if len(numbers) != 1:
+        raise ValueError(f"Slot id {slot_id!r} does not name one slot number; give the slot a \"number\"")
+    return int(numbers[0])
+
+def _slot_numbers(slots) -> dict:
+    # A slot's explicit "number" wins over the one in its id; numbers must be unique within a layout
+    numbers = {}
+    for slot in slots:
+        number = int(slot["number"]) if "number" in slot else slot_number(slot["id"])
+        if number in numbers.values():
+            raise ValueError(f"Slot {slot['id']!r} repeats slot number {number}")
+        numbers[slot["id"]] = number
+    return numbers
+
+class Layout:
+    def __init__(self, name: str, path: Path, data: dict, mtime_ns: int, size: int) -> None:
+        """
+        Parsed, read-only snapshot of one layout file. A reload builds a new
+        Layout rather than mutating this one, so readers always see a consistent view.
+        """
+        self.name = name
+        self.path = path
+        self.data = data
+        self.slots = data["slots"]
+        self.slot_numbers = _slot_numbers(self.slots)  # slot id -> slot number, validated on load
+        self.mtime_ns = mtime_ns
+        self.size = size
+        # Holds the ROIs as a precomputed array; an optional "grid_cell" (pixels) enables the spatial grid
+        self.engine = OccupancyEngine(self.slots, grid_cell=data.get("grid_cell"))
+        # Optional "inference" section: tiled detection over the ROI region instead of the full frame
+        self.inference = TilingConfig.from_dict(data.get("inference"))
+
+    @property
+    def slot_ids(self):
+        return self.engine.slot_ids
+
+    @property
+    def rois(self):
+        return self.engine.rois
+
+class LayoutService:
+    def __init__(self, check_interval: float = 1.0) -> None:
+        """
+        Keeps parsed parking layouts in memory, one per camera name.
+
+        Args:
+            check_interval (float): Minimum seconds between mtime checks of a layout
+                file. Lookups in between touch neither the file nor the parser.
+        """
+        self.check_interval = check_interval
+        self._paths = {}
+        self._layouts = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, path) -> None:
+        """Registers (or re-points) a named layout; it is parsed on first use."""
+        with self._lock:
+            self._paths[name] = Path(path)
+            self._layouts.pop(name, None)
+            self._checked_at.pop(name, None)
+
+    def register_directory(self, directory) -> list:
+        """
+        Registers every *.json file in `directory` under its file name without the
+        extension. Returns the registered names; a missing directory registers none.
+        """
+        directory = Path(directory)
+        if not directory.is_dir():
+            logger.warning("Layout directory %s does not exist; no layouts registered from it", directory)
+            return []
+        names = []
+        for path in sorted(directory.glob("*.json")):
+            self.register(path.stem, path)
+            names.append(path.stem)
+        logger.info("Registered layouts %s from %s", names, directory)
+        return names
+
+    def names(self):
+        return list(self._paths)
+
+    def _load(self, name: str, path: Path, stat) -> Layout:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return Layout(name, path, data, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, name: str = DEFAULT_LAYOUT) -> Layout:
+        """
+        Returns the named layout, re-parsing it only if the file changed on disk.
+        If a changed file cannot be read or parsed (e.g. missing or mid-write), the
+        previous layout is kept.
+        """
+        layout = self._layouts.get(name)
+        now = time.monotonic()
+        if layout is not None and now - self._checked_at.get(name, 0.0) < self.check_interval:
+            return layout
+
+        with self._lock:
+            if name not in self._paths:
+                raise KeyError(f"Unknown layout: {name}")
+            path = self._paths[name]
+            layout = self._layouts.get(name)
+            self._checked_at[name] = now
+            try:
+                stat = os.stat(path)
+                if layout is not None and (layout.mtime_ns, layout.size) == (stat.st_mtime_ns, stat.st_size):
+                    return layout
+                new_layout = self._load(name, path, stat)
+            except (OSError, ValueError, KeyError) as e:
+                if layout is None:
+                    raise
+                logger.warning("Error reloading layout %s from %s, keeping previous version: %s", name, path, e)
+                return layout
+            self._layouts[name] = new_layout  # single reference swap; readers never see a partial layout
+            if layout is not None:
+                logger.info("Reloaded layout %s from %s", name, path)
+            return new_layout
+
+layouts = LayoutService()
+layouts.register(DEFAULT_LAYOUT, DEFAULT_LAYOUT_PATH)
+if LAYOUT_DIR:
+    layouts.register_directory(LAYOUT_DIR)
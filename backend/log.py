@@ -0,0 +1,51 @@
+import logging
+import os
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+class RateLimitFilter(logging.Filter):
+    def __init__(self, burst: int = 5, interval: float = 10.0) -> None:
+        """
+        Lets at most `burst` records with the same logger and message template through
+        per `interval` seconds; the next record let through reports how many were dropped.
+        """
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}  # (logger, template) -> [window start, emitted, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg} (suppressed {suppressed} similar messages)"
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+def configure(level=None) -> None:
+    """
+    Sets up the "backend" loggers once per process: level from PARKING_LOG_LEVEL
+    (default INFO) and rate limiting so a failing hot loop cannot flood the console.
+    """
+    logger = logging.getLogger("backend")
+    if getattr(logger, "_parking_configured", False):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RateLimitFilter())
+    logger.addHandler(handler)
+    logger.setLevel(level or os.environ.get("PARKING_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    logger._parking_configured = True
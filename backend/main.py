@@ -1,107 +1,448 @@
-from fastapi import FastAPI, HTTPException
-from backend import database, models, number_plate_recognition
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from backend import database, models, jobs, layouts, rollups, slot_management, uploads, websockets, log, metrics
+from backend.cameras import CameraManager, ENTRY
+from backend.occupancy_monitor import OccupancyMonitor
+from backend.slot_manager import SlotManager
+from backend.model_registry import registry
+from backend.plates import normalize_plate
+from typing import List, Optional
+import asyncio
+import csv
+import cv2
+import io
+import json
+import logging
 import sqlite3
 from datetime import datetime
+from pathlib import Path
 import os
-import json
+
+log.configure()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Plate reading runs YOLO and OCR over whole videos, so it is kept off the event loop
+job_queue = jobs.JobQueue(max_workers=1, max_pending=8)
+
+# Optional live lot camera (file path, stream URL or camera index); occupancy is then tracked continuously
+LOT_CAMERA_SOURCE = os.environ.get("PARKING_LOT_CAMERA")
+occupancy_monitor = None
+
+# Optional JSON config of gate cameras ({"cameras": [{"name", "source", "role"}, ...]}) read continuously
+CAMERAS_CONFIG = os.environ.get("PARKING_CAMERAS")
+camera_manager = None
+
+# Pushes slot changes to WebSocket clients so dashboards don't poll /api/slots
+occupancy_broadcaster = websockets.OccupancyBroadcaster()
+
+# Optional entrance position ("x,y" in layout pixels); entering vehicles get the nearest free slot
+PARKING_ENTRANCE = os.environ.get("PARKING_ENTRANCE")
+slot_manager = SlotManager(entrance=tuple(float(v) for v in PARKING_ENTRANCE.split(",")) if PARKING_ENTRANCE else None)
+
+def get_db():
+    """FastAPI dependency that lends a pooled connection for the duration of a request."""
+    with database.connection() as conn:
+        yield conn
+
 @app.on_event("startup")
 async def startup_event():
     database.create_tables()
+    database.open_session_index()  # built now, before any request holds a pooled connection
+    slot_manager.recover()
+    occupancy_broadcaster.attach(asyncio.get_running_loop())
+    job_queue.start()
+    # Load and exercise the lot detector off the request path so the first /api/slots is fast
+    slot_management.warmup_in_background()
+    if LOT_CAMERA_SOURCE:
+        global occupancy_monitor
+        source = int(LOT_CAMERA_SOURCE) if LOT_CAMERA_SOURCE.isdigit() else LOT_CAMERA_SOURCE
+        occupancy_monitor = OccupancyMonitor(source)
+        occupancy_monitor.add_listener(lambda states: occupancy_broadcaster.update(states, occupancy_monitor.layout_name))
+        occupancy_monitor.add_listener(slot_manager.reconcile)
+        occupancy_monitor.start()
+    if CAMERAS_CONFIG:
+        global camera_manager
+        camera_manager = CameraManager.from_config_file(CAMERAS_CONFIG, _record_camera_vehicle)
+        camera_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if camera_manager is not None:
+        camera_manager.stop()
+    if occupancy_monitor is not None:
+        occupancy_monitor.stop()
+    job_queue.shutdown()
+    database.close_pool()
 
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the Parking Automation API"}
 
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus scrape target: per-stage latency histograms, DB timings and frame/OCR counters
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Lot image analysed when no frame has been uploaded yet; independent of the working directory
+SLOTS_IMAGE_PATH = Path(__file__).resolve().parent.parent / "videos" / "parking_layout_setup.jpg"
+
 @app.get("/api/slots") #<-- Add this endpoint
-async def get_slots():
-    # Load your parking layout
-    with open("parking_layout.json", "r") as f:
-        parking_layout = json.load(f)
+def get_slots(response: Response, layout: str = layouts.DEFAULT_LAYOUT):
+    # The layout is served from memory by the layout service; unknown camera names are a 404
+    if layout not in layouts.layouts.names():
+        raise HTTPException(status_code=404, detail=f"Unknown layout: {layout}")
 
-    # Load your image and process it.
-    image_path = "../videos/parking_layout_setup.jpg" #or whatever your image path is.
-    from slot_management import process_image #adjust the import.
-    slots_data = process_image(image_path)
+    # Load your image and process it once; detections are kept for /api/slots/image
+    img = cv2.imread(str(SLOTS_IMAGE_PATH))
+    if img is None:
+        raise HTTPException(status_code=500, detail="Parking lot image not found or invalid")
+    frame_id, slots_data = slot_management.analyze(img, layout)
+    response.headers["X-Frame-Id"] = str(frame_id)
+    _publish_occupancy(layout, slots_data)
 
     # Convert the slot data to a format that can be returned as JSON.
     return slots_data
 
+def _publish_occupancy(layout, slots_data):
+    if occupancy_monitor is None or layout != occupancy_monitor.layout_name:
+        # Without a live camera on this layout, each fresh analysis is what WebSocket clients see
+        occupancy_broadcaster.update(slots_data, layout)
+    if occupancy_monitor is None and layout == slot_manager.layout_name:
+        slot_manager.reconcile(slots_data)
+
+def _multipart_body(**fields):
+    # The upload endpoints parse their own bodies (see uploads.upload_form), so describe them for the docs
+    properties = {name: {"type": "array", "items": {"type": "string", "format": "binary"}} if many
+                  else {"type": "string", "format": "binary"} for name, many in fields.items()}
+    return {"requestBody": {"content": {"multipart/form-data": {"schema": {"type": "object", "properties": properties}}}}}
+
+async def _read_uploads(request: Request) -> dict:
+    """Reads a multipart upload into {field name: [(filename, bytes), ...]}; 413 when too large, 422 when malformed."""
+    try:
+        async with uploads.upload_form(request) as form:
+            files = {}
+            for name, value in form.multi_items():
+                if not isinstance(value, str):
+                    files.setdefault(name, []).append((value.filename, await value.read()))
+            return files
+    except uploads.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/api/slots/upload", openapi_extra=_multipart_body(files=True))
+async def upload_slots(request: Request, response: Response, layout: str = layouts.DEFAULT_LAYOUT):
+    """
+    Slot occupancy for uploaded lot images (JPEG/PNG in the "files" field), decoded in
+    memory. Several images run through the detector as one batch; the response is then
+    a list, one entry per image.
+    """
+    if layout not in layouts.layouts.names():
+        raise HTTPException(status_code=404, detail=f"Unknown layout: {layout}")
+    images = (await _read_uploads(request)).get("files")
+    if not images:
+        raise HTTPException(status_code=422, detail="Upload one or more lot images as 'files'")
+    return await run_in_threadpool(_analyze_uploads, images, layout, response)
+
+def _analyze_uploads(images, layout, response):
+    imgs = []
+    for filename, data in images:
+        try:
+            imgs.append(uploads.decode_image(data))
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"{filename}: {e}")
+    analysed = slot_management.analyze_batch(imgs, layout)
+    frame_id, slots_data = analysed[-1]
+    response.headers["X-Frame-Id"] = str(frame_id)
+    _publish_occupancy(layout, slots_data)
+    if len(analysed) == 1:
+        return slots_data
+    return [{"frame_id": frame_id, "slots": slots_data} for frame_id, slots_data in analysed]
+
+@app.get("/api/slots/live")
+async def get_live_slots():
+    """Debounced slot states from the live lot camera, with inference statistics."""
+    if occupancy_monitor is None:
+        raise HTTPException(status_code=503, detail="No live lot camera configured (set PARKING_LOT_CAMERA)")
+    return {"slots": occupancy_monitor.state, "stats": occupancy_monitor.stats}
+
+@app.websocket("/ws/slots")
+async def slots_websocket(websocket: WebSocket, layout: str = layouts.DEFAULT_LAYOUT):
+    """Sends a snapshot of a layout's slots as SlotStatus objects, then only the slots that change."""
+    if layout not in layouts.layouts.names():
+        await websocket.close(code=1008, reason=f"Unknown layout: {layout}")
+        return
+    await websockets.stream_occupancy(websocket, occupancy_broadcaster, layout)
+
+@app.get("/api/slots/image")
+def get_slots_image(frame_id: Optional[int] = None):
+    """
+    Returns the annotated JPEG for an analysed frame (the latest by default).
+    Rendering happens here, on request, from detections already computed by /api/slots.
+    """
+    if frame_id is None and slot_management.latest_frame_id() is None:
+        img = cv2.imread(str(SLOTS_IMAGE_PATH))
+        if img is None:
+            raise HTTPException(status_code=500, detail="Parking lot image not found or invalid")
+        slot_management.analyze(img)
+    try:
+        frame_id, jpeg = slot_management.render_frame(frame_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Frame not found")
+    return Response(content=jpeg, media_type="image/jpeg", headers={"X-Frame-Id": str(frame_id)})
+
+@app.get("/api/slots/allocation")
+async def get_slot_allocation():
+    """Free, assigned (slot -> record id) and vision-blocked slots of the allocator."""
+    return slot_manager.status()
+
+@app.get("/api/cameras")
+async def get_cameras():
+    """Health, buffering, dropped frames and processing lag of each gate camera."""
+    if camera_manager is None:
+        raise HTTPException(status_code=503, detail="No gate cameras configured (set PARKING_CAMERAS)")
+    return camera_manager.stats()
+
+@app.get("/api/models")
+async def get_models():
+    """Load time, memory footprint and warmup time of the models in this API process."""
+    return registry.report()
+
 @app.post("/parking_records/", response_model=models.ParkingRecord)
-async def create_parking_record(record: models.ParkingRecord):
-    conn = database.create_connection()
+def create_parking_record(record: models.ParkingRecord, conn: sqlite3.Connection = Depends(get_db)):
+    try:
+        entry_epoch = database.to_epoch(record.entry_time)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"entry_time must be formatted as {database.TIME_FORMAT}")
     cursor = conn.cursor()
     try:
         cursor.execute("""
             INSERT INTO parking_records (number_plate, entry_time) VALUES (?, ?)
-        """, (record.number_plate, record.entry_time))
+        """, (normalize_plate(record.number_plate), entry_epoch))
+        rollups.record_entry(conn, entry_epoch)
         conn.commit()
         record_id = cursor.lastrowid
+        database.open_session_index(conn).add(record_id, record.number_plate)
         cursor.execute("SELECT * FROM parking_records WHERE id = ?", (record_id,))
-        row = cursor.fetchone()
-        return models.ParkingRecord(number_plate=row[1], entry_time=row[2], exit_time=row[3], slot_number=row[4])
+        row = database.record_from_row(cursor.fetchone())
+        return models.ParkingRecord(number_plate=row['number_plate'], entry_time=row['entry_time'], exit_time=row['exit_time'], slot_number=row['slot_number'])
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 @app.put("/parking_records/{record_id}", response_model=models.ParkingRecord)
-async def update_parking_record(record_id: int, exit_time: str):
-    conn = database.create_connection()
+def update_parking_record(record_id: int, exit_time: str, conn: sqlite3.Connection = Depends(get_db)):
+    try:
+        exit_epoch = database.to_epoch(exit_time)
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"exit_time must be formatted as {database.TIME_FORMAT}")
     cursor = conn.cursor()
     try:
+        cursor.execute("SELECT entry_time, exit_time FROM parking_records WHERE id = ?", (record_id,))
+        previous = cursor.fetchone()
+        if previous is None:
+            raise HTTPException(status_code=404, detail="Record not found")
+        entry_epoch, previous_exit_epoch = previous
         cursor.execute("""
             UPDATE parking_records SET exit_time = ? WHERE id = ?
-        """, (exit_time, record_id))
+        """, (exit_epoch, record_id))
+        if previous_exit_epoch is not None:
+            # A corrected exit time moves the exit between buckets; re-derive both from the record
+            rollups.rebuild_since(conn, min(previous_exit_epoch, exit_epoch))
+        else:
+            rollups.record_exit(conn, entry_epoch, exit_epoch)
         conn.commit()
         cursor.execute("SELECT * FROM parking_records WHERE id = ?", (record_id,))
-        row = cursor.fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail="Record not found")
-        return models.ParkingRecord(number_plate=row[1], entry_time=row[2], exit_time=row[3], slot_number=row[4])
+        row = database.record_from_row(cursor.fetchone())
+        if previous_exit_epoch is None:
+            slot_manager.release(row['slot_number'])
+            database.open_session_index(conn).remove(record_id)
+        return models.ParkingRecord(number_plate=row['number_plate'], entry_time=row['entry_time'], exit_time=row['exit_time'], slot_number=row['slot_number'])
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
-@app.post("/extract_plate/")
+@app.get("/parking_records/", response_model=models.ParkingRecordPage)
+def list_parking_records(number_plate: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                         state: Optional[str] = Query(None, pattern="^(open|closed)$"), cursor: Optional[str] = None,
+                         limit: int = Query(100, ge=1, le=database.MAX_PAGE_SIZE)):
+    """
+    Parking history, newest entry first. `since`/`until` bound the entry time (formatted
+    as TIME_FORMAT or epoch seconds); pass the returned next_cursor to get the next page.
+    """
+    try:
+        records, next_cursor = database.list_parking_records(number_plate, since, until, state, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"records": records, "next_cursor": next_cursor}
+
+ROLLUP_DEFAULT_SPAN = {rollups.HOUR: 24 * 3600, rollups.DAY: 7 * 24 * 3600}
+ROLLUP_MAX_BUCKETS = 24 * 366
+
+@app.get("/api/rollups/{granularity}", response_model=List[models.RollupBucket])
+def get_rollups(granularity: str, since: Optional[str] = None, until: Optional[str] = None,
+                conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Hourly or daily entries, exits, peak occupancy and dwell-time statistics, read from
+    the rollup tables only. Defaults to the last 24 hours / 7 days up to now.
+    """
+    if granularity not in rollups.GRANULARITIES:
+        raise HTTPException(status_code=404, detail=f"Unknown granularity: {granularity}")
+    try:
+        if until:
+            until_epoch = database.to_epoch(until)
+        else:
+            until_epoch = rollups.next_bucket(rollups.bucket_start(database.to_epoch(), granularity), granularity)
+        since_epoch = database.to_epoch(since) if since else until_epoch - ROLLUP_DEFAULT_SPAN[granularity]
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"since/until must be formatted as {database.TIME_FORMAT} or epoch seconds")
+    if (until_epoch - since_epoch) // (3600 if granularity == rollups.HOUR else 86400) > ROLLUP_MAX_BUCKETS:
+        raise HTTPException(status_code=422, detail=f"At most {ROLLUP_MAX_BUCKETS} buckets per request")
+    try:
+        buckets = rollups.query(conn, granularity, since_epoch, until_epoch)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return [{**bucket, "bucket_start": database.format_epoch(bucket["bucket_start"])} for bucket in buckets]
+
+EXPORT_FIELDS = ["id", "number_plate", "entry_time", "exit_time", "slot_number"]
+
+def _export_lines(batches, format):
+    # One chunk per batch of rows keeps the number of writes (and memory) small and constant
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        yield buffer.getvalue()
+        for records in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(records)
+            yield buffer.getvalue()
+    else:
+        for records in batches:
+            yield "".join(json.dumps(record) + "\n" for record in records)
+
+@app.get("/parking_records/export")
+def export_parking_records(format: str = Query("ndjson", pattern="^(ndjson|csv)$"), number_plate: Optional[str] = None,
+                           since: Optional[str] = None, until: Optional[str] = None,
+                           state: Optional[str] = Query(None, pattern="^(open|closed)$")):
+    """Streams every matching record, oldest entry first, as NDJSON or CSV without loading the result set."""
+    try:
+        batches = database.iter_parking_records(number_plate, since, until, state)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="parking_records.{format}"'}
+    return StreamingResponse(_export_lines(batches, format), media_type=media_type, headers=headers)
+
+def _submit_plate_job(kind: str, fn, source, on_result):
+    try:
+        return job_queue.submit(kind, fn, source, on_result=on_result)
+    except jobs.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+def _record_entry(number_plate):
+    # A vehicle already inside (e.g. re-read while idling at the gate) keeps its open session
+    entry_record = database.get_entry_record(number_plate)
+    if entry_record:
+        return {"number_plate": number_plate, "entry_time": entry_record['entry_time'],
+                "slot_number": entry_record['slot_number'], "already_inside": True}
+    entry_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Capture the entry time
+    record_id = database.insert_parking_record(number_plate, entry_time)  # Insert the record
+    slot = slot_manager.assign(record_id) if record_id is not None else None  # None when the lot is full
+    return {"number_plate": number_plate, "entry_time": entry_time, "slot_number": slot}
+
+def _record_exit(number_plate):
+    # Fetch the entry record, allowing for an OCR misread of the plate at the exit camera
+    entry_record = database.find_open_session(number_plate)
+    if entry_record:
+        exit_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entry_time = entry_record.get('entry_time')  # Extract the entry time from the record
+
+        # Close only this open session in the database and free its slot
+        if database.update_parking_record(number_plate, exit_time, record_id=entry_record['id']):
+            slot_manager.release(entry_record['slot_number'])
+
+        result = {"number_plate": number_plate, "entry_time": entry_time, "exit_time": exit_time}  # Include entry and exit times in the response
+        if entry_record['number_plate'] != number_plate:
+            result["matched_plate"] = entry_record['number_plate']  # the plate read at entry
+        return result
+    else:
+        return {"number_plate": number_plate, "message": f"No entry record found for {number_plate}."}
+
+def _record_camera_vehicle(camera_name, role, number_plate):
+    result = _record_entry(number_plate) if role == ENTRY else _record_exit(number_plate)
+    logger.info("%s: %s %s", camera_name, role, result)
+
+def _for_each_vehicle(record):
+    """Applies `record` to every vehicle read from a feed; the first vehicle's fields stay top-level."""
+    def on_result(vehicles):
+        if not vehicles:
+            raise LookupError("Number plate not found")
+        results = [record(vehicle["number_plate"]) for vehicle in vehicles]
+        return {**results[0], "vehicles": results}
+    return on_result
+
+@app.post("/extract_plate/", response_model=models.JobStatus, status_code=202)
 async def extract_plate():
     """
-    Extracts the number plate from the video and stores it in the database.
+    Queues plate extraction from the entry video; each vehicle read is stored in the database when the job finishes.
+    Poll /jobs/{job_id} for the result.
     """
     video_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "videos", "entry_capture_feed.mp4")
-    number_plate = number_plate_recognition.extract_number_plate(video_path)
-    if number_plate:
-        entry_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Capture the entry time
-        database.insert_parking_record(number_plate, entry_time)  # Insert the record
-        return {"number_plate": number_plate, "entry_time": entry_time}
-    else:
-        raise HTTPException(status_code=404, detail="Number plate not found")
-    
-@app.post("/process_exit/")
+    job = _submit_plate_job("entry", jobs.read_plates, video_path, _for_each_vehicle(_record_entry))
+    return job.to_dict()
+
+@app.post("/process_exit/", response_model=models.JobStatus, status_code=202)
 async def process_exit():
     """
-    Processes the exit of a vehicle and updates the database.
+    Queues plate extraction from the exit video; each vehicle's open session is closed when the job finishes.
+    Poll /jobs/{job_id} for the result.
     """
     video_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "videos", "exit_camera_feed.mp4")  # Adjust the path as needed
-    number_plate = number_plate_recognition.extract_number_plate(video_path)
-    if number_plate:
-        try:
-            # Fetch the entry record from the database
-            entry_record = database.get_entry_record(number_plate)  # You'll need to implement this function in database.py
-            if entry_record:
-                exit_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                entry_time = entry_record.get('entry_time')  # Extract the entry time from the record
-
-                # Update exit time in the database
-                database.update_parking_record(number_plate, exit_time)
-                
-                return {"number_plate": number_plate, "entry_time": entry_time, "exit_time": exit_time}  # Include entry and exit times in the response
-            else:
-                return {"message": f"No entry record found for {number_plate}."}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process exit: {e}")
-    else:
-        raise HTTPException(status_code=404, detail="Number plate not found")
\ No newline at end of file
+    job = _submit_plate_job("exit", jobs.read_plates, video_path, _for_each_vehicle(_record_exit))
+    return job.to_dict()
+
+async def _submit_upload_job(kind: str, request: Request, on_result):
+    received = await _read_uploads(request)
+    frames, clips = received.get("files", []), received.get("clip", [])
+    # Exactly one of: still frames (read as one ordered sequence, batched per model call) or a video clip
+    if bool(frames) == bool(clips) or len(clips) > 1:
+        raise HTTPException(status_code=422, detail="Upload either 'files' (JPEG frames) or one 'clip'")
+    # The bytes are pickled to the worker process either way; decoding happens there
+    if clips:
+        return _submit_plate_job(kind, jobs.read_plates_from_clip, clips[0][1], on_result)
+    return _submit_plate_job(kind, jobs.read_plates_from_frames, [data for _, data in frames], on_result)
+
+@app.post("/extract_plate/upload", response_model=models.JobStatus, status_code=202,
+          openapi_extra=_multipart_body(files=True, clip=False))
+async def extract_plate_upload(request: Request):
+    """Like /extract_plate/, for uploaded entry-camera frames ("files") or a short "clip" instead of the stored video."""
+    job = await _submit_upload_job("entry", request, _for_each_vehicle(_record_entry))
+    return job.to_dict()
+
+@app.post("/process_exit/upload", response_model=models.JobStatus, status_code=202,
+          openapi_extra=_multipart_body(files=True, clip=False))
+async def process_exit_upload(request: Request):
+    """Like /process_exit/, for uploaded exit-camera frames ("files") or a short "clip" instead of the stored video."""
+    job = await _submit_upload_job("exit", request, _for_each_vehicle(_record_exit))
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}", response_model=models.JobStatus)
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}", response_model=models.JobStatus)
+async def cancel_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return job.to_dict()
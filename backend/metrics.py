@@ -0,0 +1,143 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, spanning a single SQLite call to a whole-video OCR pass
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_text(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def drain(self) -> dict:
+        """Returns the values counted so far and starts again from zero."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict) -> None:
+        """Adds values drained from another process's copy of this counter."""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Times a block (or, used as a decorator, each call) into this histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def drain(self) -> dict:
+        """Returns the observations recorded so far and starts again from empty."""
+        with self._lock:
+            series, self._series = self._series, {}
+        return series
+
+    def merge(self, series: dict) -> None:
+        """Adds observations drained from another process's copy of this histogram."""
+        with self._lock:
+            for key, values in series.items():
+                own = self._series.get(key)
+                if own is None:
+                    self._series[key] = list(values)
+                else:
+                    self._series[key] = [a + b for a, b in zip(own, values)]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames + ('le',), key + (le,))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "parking_stage_seconds",
+    "Time spent per pipeline stage (frame_decode, plate_inference, plate_preprocess, ocr, vote, vehicle_inference, occupancy_match); vote includes its ocr calls.",
+    labelnames=("stage",),
+)
+DB_SECONDS = Histogram("parking_db_seconds", "Time spent per database helper call.", labelnames=("operation",))
+FRAMES_PROCESSED = Counter("parking_frames_processed_total", "Frames run through plate detection.")
+FRAMES_SKIPPED = Counter("parking_frames_skipped_total", "Frames grabbed but not decoded because of the frame stride.")
+OCR_CALLS = Counter("parking_ocr_calls_total", "Plate crops sent to the OCR model.")
+OCR_CACHE_HITS = Counter("parking_ocr_cache_hits_total", "Plate crops answered from the OCR cache.")
+
+ALL_METRICS = [STAGE_SECONDS, DB_SECONDS, FRAMES_PROCESSED, FRAMES_SKIPPED, OCR_CALLS, OCR_CACHE_HITS]
+
+def drain() -> dict:
+    """
+    Everything recorded in this process since the last drain, by metric name. Job
+    workers send this back with each result so the API process can merge it.
+    """
+    return {metric.name: metric.drain() for metric in ALL_METRICS}
+
+def merge(deltas: dict) -> None:
+    """Adds the output of drain() from another process to this process's metrics."""
+    for metric in ALL_METRICS:
+        if metric.name in deltas:
+            metric.merge(deltas[metric.name])
+
+def render() -> str:
+    """
+    All metrics in the Prometheus text exposition format, including work done in job
+    worker processes once their jobs have finished (see drain).
+    """
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
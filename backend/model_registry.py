@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backend import detectors
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent / "models"
+PLATE_DETECTOR_PATH = MODELS_DIR / "PlateRegionDetector.pt"
+VEHICLE_DETECTOR_PATH = MODELS_DIR / "yolov8m.pt"  # working the best yolov8m
+DETECTOR_PATHS = {"plate_detector": PLATE_DETECTOR_PATH, "vehicle_detector": VEHICLE_DETECTOR_PATH}
+
+def _rss_bytes() -> int:
+    """Resident set size of this process, or 0 where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak, KiB on Linux
+    except (ImportError, OSError):
+        return 0
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        """
+        Loads models on first use and keeps one shared instance of each per process.
+        Loaders are registered by name; nothing heavy is imported until `get` is called.
+        """
+        self._loaders = {}
+        self._warmups = {}
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def register(self, name: str, loader, warmup=None) -> None:
+        """
+        Args:
+            name (str): Registry key.
+            loader: Zero-argument callable returning the model.
+            warmup: Optional callable taking the model and running a dummy inference.
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            self._warmups[name] = warmup
+            self._load_locks[name] = threading.Lock()
+            self._stats[name] = {"name": name, "loaded": False, "load_seconds": None,
+                                 "memory_bytes": None, "warmup_seconds": None}
+
+    def get(self, name: str):
+        """Returns the named model, loading it on first use."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+        with self._load_locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                model = self._loaders[name]()
+                self._stats[name].update(loaded=True, load_seconds=time.perf_counter() - start,
+                                         memory_bytes=max(0, _rss_bytes() - rss_before))
+                self._models[name] = model
+                logger.info("Loaded model %s in %.2fs", name, self._stats[name]['load_seconds'])
+        return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def warmup(self, names=None) -> None:
+        """Loads the named models (all by default) and runs one dummy inference through each."""
+        for name in names or list(self._loaders):
+            try:
+                model = self.get(name)
+                warmup = self._warmups.get(name)
+                if warmup is not None:
+                    start = time.perf_counter()
+                    warmup(model)
+                    self._stats[name]["warmup_seconds"] = time.perf_counter() - start
+            except Exception as e:
+                logger.error("Error warming up model %s: %s", name, e)
+
+    def warmup_in_background(self, names=None) -> threading.Thread:
+        """Runs `warmup` on a daemon thread so start-up is not held up by model loading."""
+        thread = threading.Thread(target=self.warmup, args=(names,), name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self) -> list:
+        """Load time, memory footprint and warmup time for every registered model."""
+        return [dict(stats) for stats in self._stats.values()]
+
+def _load_yolo(path):
+    from ultralytics import YOLO
+    threads = detectors.detector_threads()
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return YOLO(str(path))
+
+def _load_detector(path):
+    """Loads a YOLO detector on the backend chosen by PARKING_DETECTOR_BACKEND ("torch" or "onnx")."""
+    if detectors.DETECTOR_BACKEND == detectors.ONNX:
+        return detectors.load_onnx(path, detectors.DETECTOR_PRECISION, threads=detectors.detector_threads())
+    if detectors.DETECTOR_BACKEND != detectors.TORCH:
+        raise ValueError(f"Unknown detector backend: {detectors.DETECTOR_BACKEND!r}")
+    return _load_yolo(path)
+
+def _warmup_yolo(model) -> None:
+    model(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+
+def _load_plate_ocr():
+    from backend.number_plate_recognition import PlateOCR
+    return PlateOCR()
+
+def _warmup_plate_ocr(ocr) -> None:
+    ocr.extract_text(np.zeros((48, 160), dtype=np.uint8))
+
+# One registry per process; worker processes build their own on import
+registry = ModelRegistry()
+registry.register("plate_detector", lambda: _load_detector(PLATE_DETECTOR_PATH), _warmup_yolo)
+registry.register("plate_ocr", _load_plate_ocr, _warmup_plate_ocr)
+registry.register("vehicle_detector", lambda: _load_detector(VEHICLE_DETECTOR_PATH), _warmup_yolo)
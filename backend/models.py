@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 class ParkingRecord(BaseModel):
     number_plate: str
@@ -7,6 +7,31 @@ class ParkingRecord(BaseModel):
     exit_time: Optional[str] = None
     slot_number: Optional[int] = None
 
+class StoredParkingRecord(ParkingRecord):
+    id: int
+
+class ParkingRecordPage(BaseModel):
+    records: List[StoredParkingRecord]
+    next_cursor: Optional[str] = None
+
+class RollupBucket(BaseModel):
+    bucket_start: str
+    entries: int
+    exits: int
+    peak_occupancy: int
+    closing_occupancy: int
+    average_dwell_seconds: Optional[float] = None
+    dwell_histogram: Dict[str, int]
+
 class SlotStatus(BaseModel):
     slot_number: int
-    is_available: bool
\ No newline at end of file
+    is_available: bool
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    submitted_at: float
+    finished_at: Optional[float] = None
@@ -1,15 +1,28 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
 from heapq import heappush, heappushpop
-from collections import Counter
-from typing import List, Tuple, Optional
-from paddleocr import PaddleOCR
+from collections import Counter, OrderedDict
+from typing import Iterator, List, Tuple, Optional
+import hashlib
+import itertools
+import logging
 import os
-
-# Load the YOLO model
-MODEL_PATH = r'../backend/models/PlateRegionDetector.pt'
-model = YOLO(MODEL_PATH)
+import queue
+import threading
+from backend.metrics import STAGE_SECONDS, FRAMES_PROCESSED, FRAMES_SKIPPED, OCR_CALLS, OCR_CACHE_HITS
+from backend.model_registry import registry
+from backend.occupancy import iou_matrix
+from backend.plates import normalize_plate
+
+logger = logging.getLogger(__name__)
+
+def __getattr__(name):
+    # Models live in the registry and load on first use; these names are kept for existing callers
+    if name == "model":
+        return registry.get("plate_detector")
+    if name == "ocr_model":
+        return registry.get("plate_ocr")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class PlateOCR:
     def __init__(self, language: str = 'en', use_angle_cls: bool = True) -> None:
@@ -20,42 +33,402 @@ class PlateOCR:
             language (str): Language model to use for OCR. Defaults to 'en'.
             use_angle_cls (bool): Whether to use angle classification. Defaults to True.
         """
+        from paddleocr import PaddleOCR  # heavy import, deferred until an OCR model is actually built
         self.model = PaddleOCR(use_angle_cls=use_angle_cls, lang=language, show_log=False)
 
-    def extract_text(self, image) -> str:
+    def read(self, image) -> Tuple[str, float]:
         """
-        Extract text from the provided preprocessed image.
+        Extract text and its confidence from the provided preprocessed image.
 
         Args:
             image: Preprocessed input image (numpy array).
 
         Returns:
-            str: Extracted text as a single string.
+            Tuple[str, float]: Extracted text as a single string and the mean
+            recognition confidence of its parts ("" and 0.0 when nothing is read).
         """
         try:
             results = self.model.ocr(image)
 
             if not results or not results[0]:
-                return ""
+                return "", 0.0
 
             # Extract text values and combine them
             extracted_values = [item[1][0] for item in results[0]]
-            return " ".join(extracted_values)
+            confidences = [float(item[1][1]) for item in results[0]]
+            return " ".join(extracted_values), sum(confidences) / len(confidences)
+
+        except Exception as e:
+            logger.error("Error during OCR processing: %s", e)
+            return "", 0.0
 
+    def read_batch(self, images: List[np.ndarray], detect: bool = True) -> List[Tuple[str, float]]:
+        """
+        Reads several crops. With `detect=False` the text-detection stage is skipped
+        and all crops go through the recognizer in a single batched call; this is much
+        faster but treats each crop as one line of text.
+        """
+        if detect or not images:
+            return [self.read(image) for image in images]
+        try:
+            bgr_images = [cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image for image in images]
+            rec_res, _ = self.model.text_recognizer(bgr_images)
+            return [(text, float(score)) if text else ("", 0.0) for text, score in rec_res]
         except Exception as e:
-            print(f"Error during OCR processing: {str(e)}")
-            return ""
+            logger.warning("Error during batched OCR, falling back to per-crop OCR: %s", e)
+            return [self.read(image) for image in images]
+
+    def extract_text(self, image) -> str:
+        """
+        Extract text from the provided preprocessed image.
+
+        Args:
+            image: Preprocessed input image (numpy array).
+
+        Returns:
+            str: Extracted text as a single string.
+        """
+        return self.read(image)[0]
+
+PLATE_KEY_SIZE = (160, 40)  # width, height: enough to keep every character apart
+
+def plate_hash(image: np.ndarray) -> bytes:
+    """
+    Exact cache key of a plate crop: a digest of the crop binarized at PLATE_KEY_SIZE.
+    Plates differing in a single character never share a key; only crops identical at
+    that size do, such as the same plate from a static camera while the vehicle waits.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, PLATE_KEY_SIZE, interpolation=cv2.INTER_AREA)
+    return hashlib.blake2b(np.packbits(small >= 128).tobytes(), digest_size=16).digest()
+
+class OCRCache:
+    def __init__(self, maxsize: int = 512) -> None:
+        """LRU cache of OCR readings keyed by plate_hash, so an idling vehicle is read once."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        OCR_CACHE_HITS.inc()
+        return value
+
+    def put(self, key: bytes, value: Tuple[str, float]) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+ocr_cache = OCRCache()
+
+@STAGE_SECONDS.time(stage="vote")
+def vote_plate_text(top_plates: List[Tuple[float, np.ndarray]], ocr: Optional[PlateOCR] = None,
+                    batch_size: int = 3, min_confidence: float = 0.5, detect: bool = True,
+                    cache: Optional[OCRCache] = ocr_cache) -> Optional[str]:
+    """
+    Reads plate crops and returns the reading with the highest confidence-weighted vote.
+
+    Crops are read best-first in batches of `batch_size`. Each reading votes with its
+    OCR confidence (readings below `min_confidence` don't vote), and reading stops as
+    soon as the leader is ahead of the runner-up by more than the crops still unread
+    could contribute, i.e. once the outcome can no longer change.
+
+    Args:
+        top_plates: (detection confidence, preprocessed crop) pairs, best first.
+        ocr (Optional[PlateOCR]): OCR model; the registry's is used by default.
+        batch_size (int): Crops submitted to OCR at a time.
+        min_confidence (float): Minimum OCR confidence for a reading to vote.
+        detect (bool): Run text detection inside each crop (see PlateOCR.read_batch).
+        cache (Optional[OCRCache]): Reading cache keyed by crop hash; None disables it.
+    """
+    if not top_plates:
+        return None
+    ocr = ocr or registry.get("plate_ocr")
+    votes = Counter()
+    fallback = Counter()  # unweighted tally of low-confidence reads, used if nothing confident is read
+
+    for start in range(0, len(top_plates), batch_size):
+        batch = top_plates[start:start + batch_size]
+        readings = [None] * len(batch)
+        keys = [None] * len(batch)
+        misses = []
+        for index, (_, plate_img) in enumerate(batch):
+            if cache is not None:
+                keys[index] = plate_hash(plate_img)
+                readings[index] = cache.get(keys[index])
+            if readings[index] is None:
+                misses.append(index)
+
+        if misses:
+            OCR_CALLS.inc(len(misses))
+            try:
+                with STAGE_SECONDS.time(stage="ocr"):
+                    fresh = ocr.read_batch([batch[index][1] for index in misses], detect=detect)
+            except Exception as e:
+                logger.error("OCR Error on plate batch: %s", e)
+                fresh = [("", 0.0)] * len(misses)
+            for index, reading in zip(misses, fresh):
+                readings[index] = reading
+                if cache is not None and reading[0]:
+                    cache.put(keys[index], reading)
+
+        for text, confidence in readings:
+            text = normalize_plate(text)  # "KA 01" and "KA01" are the same reading
+            if not text:
+                continue
+            if confidence >= min_confidence:
+                votes[text] += confidence
+            else:
+                fallback[text] += 1
+
+        remaining = len(top_plates) - (start + len(batch))
+        ranked = votes.most_common(2)
+        if ranked:
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            if ranked[0][1] - runner_up > remaining:
+                break
+
+    if votes:
+        return votes.most_common(1)[0][0]
+    if fallback:
+        return fallback.most_common(1)[0][0]
+    return None
+
+class FrameReader:
+    _END = object()
+
+    def __init__(self, cap: cv2.VideoCapture, stride: int = 1, buffer_size: int = 32) -> None:
+        """
+        Decodes frames from an open capture on a background thread into a bounded buffer.
+
+        Args:
+            cap (cv2.VideoCapture): Opened capture; released when the reader is closed.
+            stride (int): Keep every `stride`-th frame. Skipped frames are grabbed but never decoded.
+            buffer_size (int): Maximum number of decoded frames held ahead of the consumer.
+        """
+        self.cap = cap
+        self.stride = max(1, stride)
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-reader", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        index = 0
+        try:
+            while not self._stop.is_set():
+                if index % self.stride:
+                    if not self.cap.grab():
+                        break
+                    FRAMES_SKIPPED.inc()
+                else:
+                    with STAGE_SECONDS.time(stage="frame_decode"):
+                        ret, frame = self.cap.read()
+                    if not ret or not self._put(frame):
+                        break
+                index += 1
+        finally:
+            self._put(self._END)
+
+    def batches(self, batch_size: int) -> Iterator[List[np.ndarray]]:
+        """Yields lists of up to `batch_size` consecutive frames until the video ends."""
+        batch = []
+        while True:
+            frame = self._buffer.get()
+            if frame is self._END:
+                break
+            batch.append(frame)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.cap.release()
+
+class PlateTrack:
+    def __init__(self, track_id: int, box: np.ndarray, frame_index: int, top_k: int) -> None:
+        """One plate followed across frames, holding its `top_k` best crops."""
+        self.id = track_id
+        self.box = box
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.last_crop_frame = None
+        self.hits = 1
+        self.top_k = top_k
+        self.crops = []  # min-heap of (conf, seq, crop): the weakest crop is evicted first
+        self._sequence = itertools.count()  # tie-breaker so equal confidences never compare images
+
+    @property
+    def full(self) -> bool:
+        return len(self.crops) >= self.top_k
+
+    def wants(self, conf: float) -> bool:
+        """Whether a crop at this confidence would make the top-k."""
+        return not self.full or conf > self.crops[0][0]
+
+    def add_crop(self, conf: float, crop: np.ndarray, frame_index: int) -> None:
+        entry = (conf, next(self._sequence), crop)
+        if self.full:
+            heappushpop(self.crops, entry)
+        else:
+            heappush(self.crops, entry)
+        self.last_crop_frame = frame_index
+
+    def top_plates(self) -> List[Tuple[float, np.ndarray]]:
+        """Crops best-first as (confidence, crop)."""
+        return [(conf, crop) for conf, _, crop in sorted(self.crops, key=lambda entry: entry[:2], reverse=True)]
+
+class PlateTracker:
+    def __init__(self, iou_threshold: float = 0.3, centroid_ratio: float = 0.5, max_missed: int = 15,
+                 top_k: int = 7, crop_interval: int = 5) -> None:
+        """
+        Associates plate boxes across frames so every vehicle gets its own track.
+
+        Args:
+            iou_threshold (float): Minimum IoU to continue a track.
+            centroid_ratio (float): Fallback match when IoU is too low (fast motion, low fps):
+                centroids closer than this fraction of the track box diagonal.
+            max_missed (int): Frames a track may go unseen before it is finalized.
+            top_k (int): Crops kept per track.
+            crop_interval (int): Minimum frames between crops of the same track, so the
+                kept crops are not all near-identical consecutive frames.
+        """
+        self.iou_threshold = iou_threshold
+        self.centroid_ratio = centroid_ratio
+        self.max_missed = max_missed
+        self.top_k = top_k
+        self.crop_interval = crop_interval
+        self.active: List[PlateTrack] = []
+        self._track_ids = itertools.count(1)
+
+    def _associate(self, boxes: np.ndarray) -> List[Tuple[int, int]]:
+        if not self.active or not len(boxes):
+            return []
+        track_boxes = np.array([track.box for track in self.active], dtype=np.float64)
+        scores = iou_matrix(track_boxes, boxes.astype(np.float64))
+
+        track_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        box_centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        distances = np.linalg.norm(track_centers[:, None, :] - box_centers[None, :, :], axis=2)
+        diagonals = np.linalg.norm(track_boxes[:, 2:] - track_boxes[:, :2], axis=1)
+        near = distances < self.centroid_ratio * diagonals[:, None]
+        # Centroid-only matches rank below any IoU match
+        scores = np.where(scores >= self.iou_threshold, scores + 1.0, np.where(near, 1.0 - distances / np.maximum(diagonals[:, None], 1.0), 0.0))
+
+        pairs = []
+        used_tracks, used_boxes = set(), set()
+        for flat in np.argsort(scores, axis=None)[::-1]:
+            track_index, box_index = np.unravel_index(flat, scores.shape)
+            if scores[track_index, box_index] <= 0:
+                break
+            if track_index in used_tracks or box_index in used_boxes:
+                continue
+            used_tracks.add(track_index)
+            used_boxes.add(box_index)
+            pairs.append((int(track_index), int(box_index)))
+        return pairs
+
+    def update(self, frame_index: int, boxes: np.ndarray, confs: np.ndarray, crop_fn) -> List[PlateTrack]:
+        """
+        Feeds one frame of confident plate detections and returns tracks finalized by it.
 
-ocr_model = PlateOCR()
+        Args:
+            frame_index (int): Index of the frame within the feed.
+            boxes (np.ndarray): (N, 4) integer xyxy plate boxes.
+            confs (np.ndarray): (N,) detection confidences.
+            crop_fn: Called with a box to produce a preprocessed crop (or None); only
+                invoked when the crop would actually be kept.
+        """
+        matched_boxes = set()
+        for track_index, box_index in self._associate(boxes):
+            track = self.active[track_index]
+            track.box = boxes[box_index]
+            track.last_frame = frame_index
+            track.hits += 1
+            matched_boxes.add(box_index)
+            self._offer_crop(track, boxes[box_index], float(confs[box_index]), frame_index, crop_fn)
+
+        for box_index in range(len(boxes)):
+            if box_index not in matched_boxes:
+                track = PlateTrack(next(self._track_ids), boxes[box_index], frame_index, self.top_k)
+                self.active.append(track)
+                self._offer_crop(track, boxes[box_index], float(confs[box_index]), frame_index, crop_fn)
+
+        finalized = [track for track in self.active if frame_index - track.last_frame > self.max_missed]
+        if finalized:
+            self.active = [track for track in self.active if frame_index - track.last_frame <= self.max_missed]
+        return finalized
+
+    def _offer_crop(self, track: PlateTrack, box, conf: float, frame_index: int, crop_fn) -> None:
+        if track.last_crop_frame is not None and frame_index - track.last_crop_frame < self.crop_interval:
+            return
+        if not track.wants(conf):
+            return
+        crop = crop_fn(box)
+        if crop is not None:
+            track.add_crop(conf, crop, frame_index)
+
+    def flush(self) -> List[PlateTrack]:
+        """Finalizes and returns every active track (end of feed)."""
+        finalized, self.active = self.active, []
+        return finalized
 
 class PlateDetector:
-    def __init__(self, conf_threshold: float = 0.85, cooldown_frames: int = 15, top_k: int = 7):
+    def __init__(self, conf_threshold: float = 0.85, top_k: int = 7, iou_threshold: float = 0.3,
+                 max_missed: int = 15, crop_interval: int = 5, min_hits: int = 2,
+                 region: Optional[List[int]] = None, imgsz: Optional[int] = None):
+        """
+        Detects and tracks plates frame by frame, keeping the best crops of each vehicle.
+
+        Args:
+            region (Optional[List[int]]): [x1, y1, x2, y2] band of the frame where plates
+                appear; only this crop is passed to the model. Defaults to the full frame.
+            imgsz (Optional[int]): Model input size, e.g. 320 for a narrow crop. Defaults
+                to the model's own.
+        """
+        if region is not None and (len(region) != 4 or region[2] <= region[0] or region[3] <= region[1]):
+            raise ValueError(f"Plate region must be [x1, y1, x2, y2], not {region!r}")
+        self.region = region
+        self.imgsz = imgsz
         self.conf_threshold = conf_threshold
-        self.cooldown_frames = cooldown_frames
-        self.current_cooldown = 0
         self.top_k = top_k
-        self.top_detections = []
+        self.min_hits = min_hits
+        self.tracker = PlateTracker(iou_threshold=iou_threshold, max_missed=max_missed,
+                                    top_k=top_k, crop_interval=crop_interval)
+        self.frame_index = 0
+        self.finalized: List[PlateTrack] = []
 
+    @STAGE_SECONDS.time(stage="plate_preprocess")
     def _process_plate_region(self, plate_region: np.ndarray) -> Optional[np.ndarray]:
         if plate_region.size == 0:
             return None
@@ -64,94 +437,212 @@ class PlateDetector:
         _, plate_thresh = cv2.threshold(plate_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         return plate_thresh
 
-    def process_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, bool]:
-        results = model(frame)
-        processed_frame = frame.copy()
+    def process_frame(self, frame: np.ndarray, annotate: bool = False) -> Tuple[np.ndarray, bool]:
+        """
+        Runs detection on a single frame. With `annotate`, returns an annotated copy;
+        otherwise the frame itself is returned untouched. The flag is True once some
+        track holds top_k crops.
+        """
+        results, offset = self._detect([frame])
+        FRAMES_PROCESSED.inc()
+        return self._handle_results(frame, results, annotate, offset)
+
+    def process_batch(self, frames: List[np.ndarray], annotate: bool = False,
+                      stop_when_full: bool = True) -> Tuple[List[np.ndarray], bool]:
+        """
+        Runs detection on several frames in one model call, then feeds them to the
+        tracker in order. With `stop_when_full`, stops at the first frame after which
+        a track holds top_k crops.
+        """
+        results, offset = self._detect(frames)
+        FRAMES_PROCESSED.inc(len(frames))
+        processed_frames = []
         stop_detection = False
+        for frame, result in zip(frames, results):
+            processed_frame, stop_detection = self._handle_results(frame, [result], annotate, offset)
+            processed_frames.append(processed_frame)
+            if stop_detection and stop_when_full:
+                break
+        return processed_frames, stop_detection
 
-        if self.current_cooldown > 0:
-            self.current_cooldown -= 1
+    def _crop_region(self, shape) -> Optional[Tuple[int, int, int, int]]:
+        if self.region is None:
+            return None
+        height, width = shape[:2]
+        x1, y1, x2, y2 = (int(v) for v in self.region)
+        x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2), min(height, y2)
+        if x2 <= x1 or y2 <= y1:
+            return None  # the region lies outside this feed's frames; fall back to the full frame
+        return x1, y1, x2, y2
+
+    def _detect(self, frames: List[np.ndarray]) -> Tuple[list, Tuple[int, int]]:
+        """Runs the plate model on the configured region of each frame; returns the results and the region's offset."""
+        region = self._crop_region(frames[0].shape)
+        offset = (0, 0)
+        if region is not None:
+            x1, y1, x2, y2 = region
+            frames = [frame[y1:y2, x1:x2] for frame in frames]  # views, not copies
+            offset = (x1, y1)
+        kwargs = {"verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        with STAGE_SECONDS.time(stage="plate_inference"):
+            return registry.get("plate_detector")(frames, **kwargs), offset
+
+    def _handle_results(self, frame: np.ndarray, results, annotate: bool,
+                        offset: Tuple[int, int] = (0, 0)) -> Tuple[np.ndarray, bool]:
+        processed_frame = frame.copy() if annotate else frame
+        plate_boxes, plate_confs = [], []
 
         for result in results:
             boxes = result.boxes
-            for box in boxes:
-                if box.cls == 0:
-                    conf = float(box.conf[0])
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-
-                    color = (0, 255, 0) if conf >= self.conf_threshold else (0, 165, 255)
-                    cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color, 2)
-                    cv2.putText(processed_frame, f'Conf: {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                    if conf >= self.conf_threshold and self.current_cooldown == 0:
-                        plate_region = frame[y1:y2, x1:x2]
-                        processed_plate = self._process_plate_region(plate_region)
-
-                        if processed_plate is not None:
-                            if len(self.top_detections) < self.top_k:
-                                heappush(self.top_detections, (-conf, processed_plate))
-                            else:
-                                heappushpop(self.top_detections, (-conf, processed_plate))
+            # One device-to-host transfer per result instead of one per box
+            classes = boxes.cls.cpu().numpy()
+            confs = boxes.conf.cpu().numpy()
+            coords = boxes.xyxy.cpu().numpy().astype(int) + np.array([offset[0], offset[1], offset[0], offset[1]])
+            plates = classes == 0
+            plate_boxes.append(coords[plates])
+            plate_confs.append(confs[plates])
+
+        plate_boxes = np.concatenate(plate_boxes) if plate_boxes else np.empty((0, 4), dtype=int)
+        plate_confs = np.concatenate(plate_confs) if plate_confs else np.empty((0,), dtype=np.float32)
+
+        if annotate:
+            region = self._crop_region(frame.shape)
+            if region is not None:
+                cv2.rectangle(processed_frame, region[:2], region[2:], (128, 128, 128), 1)
+            for (x1, y1, x2, y2), conf in zip(plate_boxes, plate_confs):
+                color = (0, 255, 0) if conf >= self.conf_threshold else (0, 165, 255)
+                cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(processed_frame, f'Conf: {conf:.2f}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        confident = plate_confs >= self.conf_threshold
+
+        def crop(box):
+            x1, y1, x2, y2 = box
+            return self._process_plate_region(frame[max(y1, 0):y2, max(x1, 0):x2])
+
+        self.finalized.extend(self.tracker.update(self.frame_index, plate_boxes[confident], plate_confs[confident], crop))
+        self.frame_index += 1
+        stop_detection = any(track.full for track in self.tracker.active)
+
+        if annotate:
+            for track in self.tracker.active:
+                x1, y1 = int(track.box[0]), int(track.box[1])
+                cv2.putText(processed_frame, f'Track {track.id}: {len(track.crops)}/{self.top_k}', (x1, y1 - 28),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+            cv2.putText(processed_frame, f'Threshold: {self.conf_threshold}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                        (0, 255, 0), 2)
+            cv2.putText(processed_frame, f'Tracks: {len(self.tracker.active)} active, {len(self.finalized)} done', (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
-                            self.current_cooldown = self.cooldown_frames
-
-                            if len(self.top_detections) >= self.top_k:
-                                stop_detection = True
+        return processed_frame, stop_detection
 
-        cv2.putText(processed_frame, f'Threshold: {self.conf_threshold}', (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
-                    (0, 255, 0), 2)
-        cv2.putText(processed_frame, f'Top Detections: {len(self.top_detections)}/{self.top_k}', (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    def pop_finalized(self) -> List[PlateTrack]:
+        """Returns and forgets the tracks finalized so far that were seen at least min_hits times, in order of appearance."""
+        tracks = [track for track in self.finalized if track.hits >= self.min_hits and track.crops]
+        self.finalized = []
+        return sorted(tracks, key=lambda track: track.first_frame)
 
-        return processed_frame, stop_detection
+    def finish(self) -> List[PlateTrack]:
+        """Finalizes the remaining tracks (end of feed) and returns them like pop_finalized."""
+        self.finalized.extend(self.tracker.flush())
+        return self.pop_finalized()
 
     def get_top_plates(self) -> List[Tuple[float, np.ndarray]]:
-        return [(-(conf), plate) for conf, plate in sorted(self.top_detections)]
+        """Best-first crops of the track with the most crops (the single-vehicle case)."""
+        tracks = [track for track in self.finalized + self.tracker.active if track.crops]
+        if not tracks:
+            return []
+        best = max(tracks, key=lambda track: (len(track.crops), track.hits))
+        return best.top_plates()
 
     def clear_detections(self):
-        self.top_detections = []
-
-def extract_number_plate(video_path: str):
-    cap = cv2.VideoCapture(video_path)
+        self.tracker = PlateTracker(iou_threshold=self.tracker.iou_threshold, centroid_ratio=self.tracker.centroid_ratio,
+                                    max_missed=self.tracker.max_missed, top_k=self.top_k,
+                                    crop_interval=self.tracker.crop_interval)
+        self.frame_index = 0
+        self.finalized = []
+
+def _run_detector(video_path, detector: PlateDetector, frame_stride: int, batch_size: int,
+                  buffer_size: int, stop_when_full: bool) -> bool:
+    # Accepts an already opened capture too, e.g. an uploaded clip read from memory
+    cap = video_path if isinstance(video_path, cv2.VideoCapture) else cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        print(f"Error: Could not open video: {video_path}")
-        return None
-
-    detector = PlateDetector(conf_threshold=0.85)
+        logger.error("Could not open video: %s", video_path)
+        return False
 
+    reader = FrameReader(cap, stride=frame_stride, buffer_size=buffer_size)
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            _, stop_detection = detector.process_frame(frame)
-            if stop_detection:
+        for frames in reader.batches(batch_size):
+            _, stop_detection = detector.process_batch(frames, stop_when_full=stop_when_full)
+            if stop_detection and stop_when_full:
                 break
-
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        reader.close()
+    return True
+
+def extract_number_plate(video_path, frame_stride: int = 1, batch_size: int = 8, buffer_size: int = 32):
+    """
+    Reads the number plate of the first vehicle that fills its crop buffer.
+
+    Args:
+        video_path: Path of the video file, or an opened cv2.VideoCapture.
+        frame_stride (int): Run detection on every `frame_stride`-th frame.
+        batch_size (int): Frames per YOLO call.
+        buffer_size (int): Decoded frames buffered ahead of inference.
+
+    Returns:
+        Optional[str]: The confidence-weighted consensus reading of the best plate crops, or None.
+    """
+    detector = PlateDetector(conf_threshold=0.85)
+    if not _run_detector(video_path, detector, frame_stride, batch_size, buffer_size, stop_when_full=True):
+        return None
 
     top_plates = detector.get_top_plates()
-    if top_plates:
-        ocr_results = []
-        for conf, plate_img in top_plates:
-            try:
-                # Pass the plate image to the OCR model
-                result = ocr_model.extract_text(plate_img)
-                if result:
-                    ocr_results.append(result)
-            except Exception as e:
-                print(f"OCR Error on plate with confidence {conf:.2f}: {str(e)}")
-
-        if ocr_results:
-            final_result = Counter(ocr_results).most_common(1)[0][0]
-            detector.clear_detections()
-            return final_result
-
     detector.clear_detections()
-    return None
+    return vote_plate_text(top_plates)
+
+def extract_number_plates(video_path, frame_stride: int = 1, batch_size: int = 8, buffer_size: int = 32) -> List[dict]:
+    """
+    Reads every vehicle in a video (a path or an opened cv2.VideoCapture). Each track
+    is OCR'd once, when it is finalized.
+
+    Returns:
+        List[dict]: One entry per vehicle in order of appearance, with keys
+        "track_id", "number_plate", "first_frame", "last_frame" and "hits".
+        Consecutive tracks reading the same plate are merged.
+    """
+    detector = PlateDetector(conf_threshold=0.85)
+    if not _run_detector(video_path, detector, frame_stride, batch_size, buffer_size, stop_when_full=False):
+        return []
+    return _read_vehicles(detector)
+
+def extract_number_plates_from_frames(frames: List[np.ndarray], batch_size: int = 8) -> List[dict]:
+    """
+    Reads every vehicle in a sequence of already decoded frames (e.g. uploaded JPEGs),
+    running detection on up to `batch_size` frames per model call. Returns the same
+    entries as extract_number_plates.
+    """
+    detector = PlateDetector(conf_threshold=0.85)
+    for start in range(0, len(frames), batch_size):
+        detector.process_batch(frames[start:start + batch_size], stop_when_full=False)
+    return _read_vehicles(detector)
+
+def _read_vehicles(detector: PlateDetector) -> List[dict]:
+    vehicles = []
+    for track in detector.finish():
+        number_plate = vote_plate_text(track.top_plates())
+        if not number_plate:
+            continue
+        if vehicles and vehicles[-1]["number_plate"] == number_plate:
+            # The same plate lost and re-acquired (e.g. briefly occluded)
+            vehicles[-1]["last_frame"] = track.last_frame
+            vehicles[-1]["hits"] += track.hits
+            continue
+        vehicles.append({"track_id": track.id, "number_plate": number_plate, "first_frame": track.first_frame,
+                         "last_frame": track.last_frame, "hits": track.hits})
+    return vehicles
 
 if __name__ == "__main__":
     # Example usage (for testing)
@@ -0,0 +1,136 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+def detections_from_results(results) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Flattens ultralytics results into (N, 4) xyxy boxes and (N,) scores,
+    moving each tensor to the host once.
+    """
+    boxes, scores = [], []
+    for result in results:
+        boxes.append(result.boxes.xyxy.cpu().numpy())
+        scores.append(result.boxes.conf.cpu().numpy())
+    if not boxes:
+        return np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=np.float32)
+    return np.concatenate(boxes).reshape(-1, 4), np.concatenate(scores).reshape(-1)
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Element-wise IoU of broadcastable xyxy box arrays (last axis holds the 4 coordinates)."""
+    inter_w = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    inter_h = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    # Boxes that only touch or don't overlap contribute nothing
+    inter = np.where((inter_w > 0) & (inter_h > 0), inter_w * inter_h, 0.0)
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(inter > 0, inter / union, 0.0)
+
+def iou_matrix(rois: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """IoU of every ROI against every box as an (R, B) matrix."""
+    return box_iou(rois[:, None, :], boxes[None, :, :])
+
+class OccupancyEngine:
+    def __init__(self, slots: List[dict], iou_threshold: float = 0.5, conf_threshold: float = 0.5,
+                 grid_cell: Optional[int] = None) -> None:
+        """
+        Matches vehicle detections against precompiled slot ROIs.
+
+        Args:
+            slots (List[dict]): Layout slots, each {"id": ..., "roi": [x1, y1, x2, y2]}.
+            iou_threshold (float): A slot is occupied when its best IoU exceeds this.
+            conf_threshold (float): Detections scoring below this are ignored.
+            grid_cell (Optional[int]): Cell size in pixels for a spatial grid over the slots.
+                When set, each detection is only tested against slots in the cells it
+                touches instead of every slot. Useful for very large lots; set through
+                a layout's "grid_cell" key.
+        """
+        if grid_cell is not None and grid_cell < 1:
+            raise ValueError(f"grid_cell must be a positive number of pixels, not {grid_cell}")
+        self.slot_ids = [slot["id"] for slot in slots]
+        self.rois = np.array([slot["roi"] for slot in slots], dtype=np.float64).reshape(-1, 4)
+        self.iou_threshold = iou_threshold
+        self.conf_threshold = conf_threshold
+        self.grid_cell = grid_cell
+        self._grid = self._build_grid() if grid_cell else None
+
+    @classmethod
+    def from_layout_file(cls, path, **kwargs) -> "OccupancyEngine":
+        with open(path, "r") as f:
+            return cls(json.load(f)["slots"], **kwargs)
+
+    def _cells(self, box) -> List[Tuple[int, int]]:
+        cell = self.grid_cell
+        x1, y1, x2, y2 = (int(v // cell) for v in box)
+        return [(cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1)]
+
+    def _build_grid(self) -> Dict[Tuple[int, int], np.ndarray]:
+        grid = {}
+        for index, roi in enumerate(self.rois):
+            for key in self._cells(roi):
+                grid.setdefault(key, []).append(index)
+        return {key: np.array(indices, dtype=np.intp) for key, indices in grid.items()}
+
+    def _candidate_pairs(self, boxes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        slot_idx, det_idx = [], []
+        for index, box in enumerate(boxes):
+            hits = [self._grid[key] for key in self._cells(box) if key in self._grid]
+            if hits:
+                slots = np.unique(np.concatenate(hits))
+                slot_idx.append(slots)
+                det_idx.append(np.full(len(slots), index, dtype=np.intp))
+        if not slot_idx:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(slot_idx), np.concatenate(det_idx)
+
+    def match(self, boxes: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Scores every slot against the detections.
+
+        Returns:
+            Tuple of (occupied, best_iou, best_detection) arrays, one entry per slot.
+            best_detection indexes into `boxes`, or is -1 when nothing overlaps.
+        """
+        slot_count = len(self.slot_ids)
+        best_iou = np.zeros(slot_count, dtype=np.float64)
+        best_detection = np.full(slot_count, -1, dtype=np.intp)
+
+        keep = np.flatnonzero(scores >= self.conf_threshold)
+        if slot_count and keep.size:
+            # Integer pixel boxes, as the per-slot loop this replaces used
+            kept_boxes = boxes[keep].astype(int).astype(np.float64)
+            if self._grid is None:
+                ious = iou_matrix(self.rois, kept_boxes)
+                columns = ious.argmax(axis=1)
+                best_iou = ious[np.arange(slot_count), columns]
+                best_detection = np.where(best_iou > 0, keep[columns], -1)
+            else:
+                slot_idx, det_idx = self._candidate_pairs(kept_boxes)
+                if slot_idx.size:
+                    pair_ious = box_iou(self.rois[slot_idx], kept_boxes[det_idx])
+                    # Sort by slot, then IoU, then detection descending: the last pair of each slot
+                    # is its best, ties going to the first detection as argmax does above
+                    order = np.lexsort((-det_idx, pair_ious, slot_idx))
+                    slots = slot_idx[order]
+                    last = order[np.append(slots[1:] != slots[:-1], True)]
+                    best_iou[slot_idx[last]] = pair_ious[last]
+                    best_detection[slot_idx[last]] = keep[det_idx[last]]
+                    best_detection[best_iou <= 0] = -1
+
+        occupied = best_iou > self.iou_threshold
+        return occupied, best_iou, best_detection
+
+    def evaluate(self, results) -> Dict[str, dict]:
+        """Per-slot occupancy, best IoU and matching detection index for ultralytics results."""
+        occupied, best_iou, best_detection = self.match(*detections_from_results(results))
+        return {
+            slot_id: {"occupied": bool(occupied[i]), "iou": float(best_iou[i]), "detection": int(best_detection[i])}
+            for i, slot_id in enumerate(self.slot_ids)
+        }
+
+    def occupancy(self, results) -> Dict[str, bool]:
+        """Maps each slot id to whether it is occupied."""
+        occupied, _, _ = self.match(*detections_from_results(results))
+        return dict(zip(self.slot_ids, occupied.tolist()))
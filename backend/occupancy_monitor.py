@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from backend import slot_management
+from backend.layouts import layouts, DEFAULT_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+class SlotDebouncer:
+    def __init__(self, slot_ids: List[str], confirm_frames: int = 3) -> None:
+        """
+        Hysteresis filter for slot states: a slot only flips once `confirm_frames`
+        consecutive observations disagree with its current state.
+        """
+        self.confirm_frames = confirm_frames
+        self.state = {slot_id: None for slot_id in slot_ids}
+        self._streak = {slot_id: 0 for slot_id in slot_ids}
+
+    def update(self, observed: Dict[str, bool]) -> Dict[str, bool]:
+        """Feeds one observation per slot and returns the slots whose stable state changed."""
+        changed = {}
+        for slot_id, occupied in observed.items():
+            current = self.state.get(slot_id)
+            if current is None:
+                self.state[slot_id] = occupied  # first observation is taken as-is
+                self._streak[slot_id] = 0
+                changed[slot_id] = occupied
+            elif occupied == current:
+                self._streak[slot_id] = 0
+            else:
+                self._streak[slot_id] = self._streak.get(slot_id, 0) + 1
+                if self._streak[slot_id] >= self.confirm_frames:
+                    self.state[slot_id] = occupied
+                    self._streak[slot_id] = 0
+                    changed[slot_id] = occupied
+        return changed
+
+    def pending(self) -> List[str]:
+        """Slots with an unconfirmed flip in progress."""
+        return [slot_id for slot_id, streak in self._streak.items() if streak > 0]
+
+class OccupancyMonitor:
+    def __init__(self, source, layout_name: str = DEFAULT_LAYOUT, diff_threshold: float = 10.0,
+                 refresh_interval: float = 30.0, confirm_frames: int = 3, scale: float = 0.25,
+                 frame_stride: int = 1) -> None:
+        """
+        Tracks slot occupancy over a live camera stream, running detection only when needed.
+
+        Each frame is reduced to a small blurred grayscale image and compared with the
+        image seen at the last detection. The mean absolute difference inside every
+        slot ROI is read from an integral image, so the check is one pass over the
+        pixels regardless of the number of slots. Detection runs when a slot changed,
+        while a flip is awaiting confirmation, or every `refresh_interval` seconds.
+
+        Args:
+            source: Video file path, stream URL or camera index for cv2.VideoCapture.
+            layout_name (str): Layout (camera) whose slots are monitored.
+            diff_threshold (float): Mean gray-level change in a ROI that counts as motion.
+            refresh_interval (float): Seconds between detections on an unchanged scene.
+            confirm_frames (int): Consecutive detections needed before a slot flips.
+            scale (float): Downscale factor applied before differencing.
+            frame_stride (int): Only every `frame_stride`-th frame is examined.
+        """
+        self.source = source
+        self.layout_name = layout_name
+        self.diff_threshold = diff_threshold
+        self.refresh_interval = refresh_interval
+        self.scale = scale
+        self.frame_stride = max(1, frame_stride)
+        self.debouncer = SlotDebouncer(layouts.get(layout_name).slot_ids, confirm_frames)
+        self.stats = {"frames": 0, "inferences": 0, "last_inference_at": None, "last_frame_id": None}
+        self._listeners = []
+        self._layout = None
+        self._baseline = None
+        self._roi_cells = None
+        self._last_detection = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback: Callable[[Dict[str, bool]], None]) -> None:
+        """Registers a callback invoked with {slot_id: occupied} for every confirmed change."""
+        self._listeners.append(callback)
+
+    @property
+    def state(self) -> Dict[str, Optional[bool]]:
+        with self._lock:
+            return dict(self.debouncer.state)
+
+    def _small_gray(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _compile_rois(self, layout, shape) -> None:
+        height, width = shape
+        cells = np.floor(layout.rois * self.scale).astype(np.intp)
+        # Integral image coordinates: keep every ROI at least one pixel inside the frame
+        cells[:, 0] = np.clip(cells[:, 0], 0, width - 1)
+        cells[:, 1] = np.clip(cells[:, 1], 0, height - 1)
+        cells[:, 2] = np.clip(cells[:, 2], cells[:, 0] + 1, width)
+        cells[:, 3] = np.clip(cells[:, 3], cells[:, 1] + 1, height)
+        self._roi_cells = cells
+        self._layout = layout
+
+    def changed_slots(self, gray: np.ndarray) -> np.ndarray:
+        """Boolean mask over the layout's slots marking those whose pixels moved since the baseline."""
+        diff = cv2.absdiff(gray, self._baseline)
+        integral = cv2.integral(diff, sdepth=cv2.CV_64F)
+        x1, y1, x2, y2 = self._roi_cells.T
+        sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        areas = (x2 - x1) * (y2 - y1)
+        return sums / areas > self.diff_threshold
+
+    def process_frame(self, frame: np.ndarray) -> Dict[str, bool]:
+        """Examines one frame and returns the slots whose debounced state changed."""
+        self.stats["frames"] += 1
+        gray = self._small_gray(frame)
+        layout = layouts.get(self.layout_name)
+        if layout is not self._layout or self._baseline is None or self._baseline.shape != gray.shape:
+            self._compile_rois(layout, gray.shape)
+            self._baseline = None
+
+        now = time.monotonic()
+        needs_detection = (
+            self._baseline is None
+            or now - self._last_detection >= self.refresh_interval
+            or bool(self.debouncer.pending())
+            or bool(self.changed_slots(gray).any())
+        )
+        if not needs_detection:
+            return {}
+
+        frame_id, observed = slot_management.analyze(frame, self.layout_name)
+        self._baseline = gray
+        self._last_detection = now
+        self.stats["inferences"] += 1
+        self.stats["last_inference_at"] = time.time()
+        self.stats["last_frame_id"] = frame_id
+
+        with self._lock:
+            changed = self.debouncer.update(observed)
+        if changed:
+            for callback in list(self._listeners):
+                try:
+                    callback(changed)
+                except Exception as e:
+                    logger.error("Error in occupancy listener: %s", e)
+        return changed
+
+    def run(self) -> None:
+        """Reads the stream until it ends or `stop` is called."""
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            logger.error("Could not open lot camera: %s", self.source)
+            return
+        index = 0
+        try:
+            while not self._stop.is_set():
+                if index % self.frame_stride:
+                    if not cap.grab():
+                        break
+                else:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    self.process_frame(frame)
+                index += 1
+        finally:
+            cap.release()
+
+    def start(self) -> threading.Thread:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="occupancy-monitor", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+if __name__ == "__main__":
+    import sys
+    source = sys.argv[1] if len(sys.argv) > 1 else "../videos/parking_layout_setup.jpg"
+    monitor = OccupancyMonitor(source)
+    monitor.add_listener(lambda changed: print(f"Changed: {changed}"))
+    monitor.run()
+    print(f"Frames: {monitor.stats['frames']}, inferences: {monitor.stats['inferences']}")
@@ -0,0 +1,113 @@
+import re
+import threading
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# Characters OCR commonly mistakes for each other on plates, grouped by the digit they resemble
+CONFUSABLE_GROUPS = ("0OQD", "1IL", "2Z", "4A", "5S", "6G", "8B")
+_SKELETON = {char: group[0] for group in CONFUSABLE_GROUPS for char in group}
+
+CONFUSABLE_COST = 1  # substituting look-alikes, e.g. O for 0
+EDIT_COST = 3  # any other substitution, insertion or deletion
+DEFAULT_MAX_DISTANCE = 3  # one real misread, or up to three look-alike swaps
+
+def normalize_plate(text: str) -> str:
+    """Upper-cases a plate and drops spaces and punctuation, so "ka-01 ab 1234" reads "KA01AB1234"."""
+    return re.sub(r"[^0-9A-Z]", "", text.upper())
+
+def skeleton(plate: str) -> str:
+    """Maps every character to its look-alike group, so plates differing only by confusions share a skeleton."""
+    return "".join(_SKELETON.get(char, char) for char in plate)
+
+def ocr_distance(a: str, b: str) -> int:
+    """
+    Edit distance between normalized plates where swapping look-alike characters
+    costs CONFUSABLE_COST and every other edit costs EDIT_COST.
+    """
+    previous = [j * EDIT_COST for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, 1):
+        current = [i * EDIT_COST]
+        for j, char_b in enumerate(b, 1):
+            if char_a == char_b:
+                substitution = 0
+            elif _SKELETON.get(char_a, char_a) == _SKELETON.get(char_b, char_b):
+                substitution = CONFUSABLE_COST
+            else:
+                substitution = EDIT_COST
+            current.append(min(previous[j] + EDIT_COST, current[j - 1] + EDIT_COST, previous[j - 1] + substitution))
+        previous = current
+    return previous[-1]
+
+def _index_keys(plate: str) -> Set[str]:
+    # The skeleton plus every single-character deletion of it: two plates within one
+    # edit of each other (after look-alikes are merged) always share at least one key
+    shape = skeleton(plate)
+    keys = {shape}
+    keys.update(shape[:i] + shape[i + 1:] for i in range(len(shape)))
+    return keys
+
+class PlateIndex:
+    def __init__(self) -> None:
+        """
+        Approximate-match index over the plates of open sessions.
+
+        Candidates are found with a handful of dict lookups on look-alike skeletons and
+        their single deletions, then ranked with ocr_distance, so a lookup costs
+        O(plate length) regardless of how many vehicles are inside.
+        """
+        self._plates: Dict[int, str] = {}  # record id -> normalized plate
+        self._keys: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._plates)
+
+    def add(self, record_id: int, plate: str) -> None:
+        plate = normalize_plate(plate)
+        with self._lock:
+            self._remove(record_id)
+            self._plates[record_id] = plate
+            for key in _index_keys(plate):
+                self._keys.setdefault(key, set()).add(record_id)
+
+    def _remove(self, record_id: int) -> None:
+        plate = self._plates.pop(record_id, None)
+        if plate is None:
+            return
+        for key in _index_keys(plate):
+            ids = self._keys.get(key)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self._keys[key]
+
+    def remove(self, record_id: int) -> None:
+        with self._lock:
+            self._remove(record_id)
+
+    def replace_all(self, records: Iterable[Tuple[int, str]]) -> None:
+        """Rebuilds the index from (record id, plate) pairs."""
+        with self._lock:
+            self._plates = {}
+            self._keys = {}
+        for record_id, plate in records:
+            self.add(record_id, plate)
+
+    def lookup(self, plate: str, max_distance: int = DEFAULT_MAX_DISTANCE) -> Optional[Tuple[int, str, int]]:
+        """
+        Returns (record id, indexed plate, distance) of the closest open session within
+        `max_distance`, preferring the most recent record on ties; None if none is close enough.
+        Candidates cover any number of look-alike swaps plus one other edit, which is
+        every plate within the default distance.
+        """
+        plate = normalize_plate(plate)
+        with self._lock:
+            candidates = set()
+            for key in _index_keys(plate):
+                candidates.update(self._keys.get(key, ()))
+            scored = [(ocr_distance(plate, self._plates[record_id]), -record_id) for record_id in candidates]
+            if not scored:
+                return None
+            distance, negative_id = min(scored)
+            if distance > max_distance:
+                return None
+            return -negative_id, self._plates[-negative_id], distance
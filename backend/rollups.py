@@ -0,0 +1,237 @@
+import bisect
+import time
+from datetime import datetime, timedelta
+
+HOUR = "hour"
+DAY = "day"
+GRANULARITIES = (HOUR, DAY)
+
+# Upper bounds (seconds) of the dwell-time histogram bins; the last bin is open-ended
+DWELL_BINS = (15 * 60, 30 * 60, 3600, 2 * 3600, 4 * 3600, 8 * 3600, 24 * 3600)
+DWELL_BIN_LABELS = ("<15m", "15-30m", "30m-1h", "1-2h", "2-4h", "4-8h", "8-24h", ">=24h")
+
+def bucket_start(epoch, granularity):
+    """Start of the local hour, or of the local calendar day, containing `epoch`."""
+    epoch = int(epoch)
+    if granularity == HOUR:
+        # Local, so hours line up with days in zones offset by a fraction of an hour (e.g. +05:30)
+        local = datetime.fromtimestamp(epoch)
+        return epoch - local.minute * 60 - local.second
+    day = datetime.fromtimestamp(epoch).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(day.timestamp())
+
+def next_bucket(start, granularity):
+    if granularity == HOUR:
+        # Re-aligned, in case a DST change shifts the clock by less than an hour
+        return bucket_start(start + 3600, HOUR)
+    # Days are 23-25 hours long around DST changes
+    day = datetime.fromtimestamp(start) + timedelta(days=1)
+    return int(day.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def dwell_bin(seconds):
+    return bisect.bisect_right(DWELL_BINS, seconds)
+
+def create_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS occupancy_rollups (
+            granularity TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            entries INTEGER NOT NULL DEFAULT 0,
+            exits INTEGER NOT NULL DEFAULT 0,
+            peak_occupancy INTEGER NOT NULL DEFAULT 0,
+            closing_occupancy INTEGER NOT NULL DEFAULT 0,
+            dwell_seconds INTEGER NOT NULL DEFAULT 0,
+            dwell_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket_start)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dwell_histogram (
+            granularity TEXT NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket_start, bin)
+        ) WITHOUT ROWID;
+    """)
+
+def _open_sessions(conn):
+    # Served from the partial open-session index, so this is O(vehicles inside)
+    return conn.execute("SELECT COUNT(*) FROM parking_records WHERE exit_time IS NULL").fetchone()[0]
+
+def _upsert(conn, granularity, start, entries, exits, peak, closing, dwell_seconds, dwell_count):
+    conn.execute("""
+        INSERT INTO occupancy_rollups
+            (granularity, bucket_start, entries, exits, peak_occupancy, closing_occupancy, dwell_seconds, dwell_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (granularity, bucket_start) DO UPDATE SET
+            entries = entries + excluded.entries,
+            exits = exits + excluded.exits,
+            peak_occupancy = max(peak_occupancy, excluded.peak_occupancy),
+            closing_occupancy = excluded.closing_occupancy,
+            dwell_seconds = dwell_seconds + excluded.dwell_seconds,
+            dwell_count = dwell_count + excluded.dwell_count
+    """, (granularity, start, entries, exits, peak, closing, dwell_seconds, dwell_count))
+
+def _is_current(epoch):
+    return bucket_start(epoch, HOUR) >= bucket_start(time.time(), HOUR)
+
+def record_entry(conn, entry_epoch):
+    """
+    Counts an entry into its hourly and daily buckets. Call on the connection that
+    inserted the record, before committing, so the rollup commits with it.
+
+    Occupancy is taken from the open sessions right now, which is only the occupancy
+    of the entry's bucket when that bucket is the current one; a back-dated entry
+    re-derives its day and everything after it instead (see rebuild_since).
+    """
+    if not _is_current(entry_epoch):
+        rebuild_since(conn, entry_epoch)
+        return
+    occupancy = _open_sessions(conn)
+    for granularity in GRANULARITIES:
+        _upsert(conn, granularity, bucket_start(entry_epoch, granularity), 1, 0, occupancy, occupancy, 0, 0)
+
+def record_exit(conn, entry_epoch, exit_epoch):
+    """
+    Counts an exit and its dwell time into the buckets of the exit time. Call on the
+    connection that closed the record, before committing. Like record_entry, only an
+    exit in the current bucket is applied incrementally; older ones re-derive.
+    """
+    if not _is_current(exit_epoch):
+        rebuild_since(conn, exit_epoch)
+        return
+    occupancy = _open_sessions(conn)
+    dwell = max(0, exit_epoch - entry_epoch)
+    for granularity in GRANULARITIES:
+        start = bucket_start(exit_epoch, granularity)
+        # The occupancy just before this exit was one higher
+        _upsert(conn, granularity, start, 0, 1, occupancy + 1, occupancy, dwell, 1)
+        conn.execute("""
+            INSERT INTO dwell_histogram (granularity, bucket_start, bin, count) VALUES (?, ?, ?, 1)
+            ON CONFLICT (granularity, bucket_start, bin) DO UPDATE SET count = count + 1
+        """, (granularity, start, dwell_bin(dwell)))
+
+def rebuild_since(conn, epoch):
+    """
+    Re-derives every bucket from the local day containing `epoch` onwards from
+    parking_records, e.g. after a back-dated event or a corrected exit time. Call after
+    the records have been changed, on the same connection, before committing.
+    Returns the number of events replayed.
+    """
+    return _replay(conn, bucket_start(epoch, DAY))
+
+def backfill(conn):
+    """
+    Rebuilds every rollup from parking_records in one pass over entry and exit events
+    in time order. Runs inside the caller's transaction; returns the number of events.
+    """
+    return _replay(conn, None)
+
+def _replay(conn, since):
+    # Replays events at or after `since` (a local day start, so also an hour start), or all of them
+    if since is None:
+        conn.execute("DELETE FROM occupancy_rollups")
+        conn.execute("DELETE FROM dwell_histogram")
+        occupancy = 0
+        since = float("-inf")
+    else:
+        conn.execute("DELETE FROM occupancy_rollups WHERE bucket_start >= ?", (since,))
+        conn.execute("DELETE FROM dwell_histogram WHERE bucket_start >= ?", (since,))
+        occupancy = conn.execute("""
+            SELECT COUNT(*) FROM parking_records
+            WHERE entry_time < ? AND (exit_time IS NULL OR exit_time >= ?)
+        """, (since, since)).fetchone()[0]
+    buckets = {}  # (granularity, start) -> [entries, exits, peak, closing, dwell_seconds, dwell_count]
+    histogram = {}  # (granularity, start, bin) -> count
+    events = 0
+    cursor = conn.execute("""
+        SELECT entry_time AS at, 1 AS delta, NULL AS dwell FROM parking_records WHERE entry_time >= ?
+        UNION ALL
+        SELECT exit_time, -1, exit_time - entry_time FROM parking_records WHERE exit_time >= ?
+        ORDER BY at, delta
+    """, (since, since))
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        for at, delta, dwell in rows:
+            before = occupancy
+            occupancy += delta
+            events += 1
+            for granularity in GRANULARITIES:
+                start = bucket_start(at, granularity)
+                bucket = buckets.get((granularity, start))
+                if bucket is None:
+                    bucket = buckets[(granularity, start)] = [0, 0, before, before, 0, 0]
+                if delta > 0:
+                    bucket[0] += 1
+                else:
+                    dwell = max(0, dwell)
+                    bucket[1] += 1
+                    bucket[4] += dwell
+                    bucket[5] += 1
+                    key = (granularity, start, dwell_bin(dwell))
+                    histogram[key] = histogram.get(key, 0) + 1
+                bucket[2] = max(bucket[2], before, occupancy)
+                bucket[3] = occupancy
+    conn.executemany("""
+        INSERT INTO occupancy_rollups
+            (granularity, bucket_start, entries, exits, peak_occupancy, closing_occupancy, dwell_seconds, dwell_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [key + tuple(values) for key, values in buckets.items()])
+    conn.executemany("INSERT INTO dwell_histogram (granularity, bucket_start, bin, count) VALUES (?, ?, ?, ?)",
+                     [key + (count,) for key, count in histogram.items()])
+    return events
+
+def query(conn, granularity, since, until):
+    """
+    Returns one dict per bucket in [since, until), reading only the rollup tables.
+    Buckets without events are filled in, carrying the occupancy of the bucket before.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}, not {granularity!r}")
+    first = bucket_start(since, granularity)
+    rows = {row[0]: row[1:] for row in conn.execute("""
+        SELECT bucket_start, entries, exits, peak_occupancy, closing_occupancy, dwell_seconds, dwell_count
+        FROM occupancy_rollups WHERE granularity = ? AND bucket_start >= ? AND bucket_start < ?
+    """, (granularity, first, until))}
+    histograms = {}
+    for start, bin, count in conn.execute("""
+        SELECT bucket_start, bin, count FROM dwell_histogram
+        WHERE granularity = ? AND bucket_start >= ? AND bucket_start < ?
+    """, (granularity, first, until)):
+        histograms.setdefault(start, [0] * len(DWELL_BIN_LABELS))[bin] = count
+    previous = conn.execute("""
+        SELECT closing_occupancy FROM occupancy_rollups
+        WHERE granularity = ? AND bucket_start < ? ORDER BY bucket_start DESC LIMIT 1
+    """, (granularity, first)).fetchone()
+    occupancy = previous[0] if previous else 0
+
+    buckets = []
+    start = first
+    while start < until:
+        entries, exits, peak, closing, dwell_seconds, dwell_count = rows.get(start, (0, 0, occupancy, occupancy, 0, 0))
+        occupancy = closing
+        bins = histograms.get(start, [0] * len(DWELL_BIN_LABELS))
+        buckets.append({
+            "bucket_start": start,
+            "entries": entries,
+            "exits": exits,
+            "peak_occupancy": peak,
+            "closing_occupancy": closing,
+            "average_dwell_seconds": dwell_seconds / dwell_count if dwell_count else None,
+            "dwell_histogram": dict(zip(DWELL_BIN_LABELS, bins)),
+        })
+        start = next_bucket(start, granularity)
+    return buckets
+
+if __name__ == "__main__":
+    # Rebuild the rollups from the full parking history: python -m backend.rollups
+    from backend import database
+    database.create_tables()
+    with database.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        events = backfill(conn)
+        conn.commit()
+    print(f"Rebuilt rollups from {events} entry/exit events.")
@@ -1,5 +1,6 @@
 import cv2
 import json
+import os
 
 def select_rois(image_path):
     """
@@ -26,8 +27,17 @@ def select_rois(image_path):
 
         cv2.imshow("Select ROI", temp_img)  # Update the displayed image
 
-    with open("parking_layout.json", "w") as f:
-        json.dump({"slots": slots}, f, indent=4)
+    # Keep any other settings (e.g. "inference") of an existing layout
+    layout = {}
+    if os.path.exists("parking_layout.json"):
+        with open("parking_layout.json", "r") as f:
+            layout = json.load(f)
+    layout["slots"] = slots
+
+    # Write to a temp file and swap it in, so a running API never reads a half-written layout
+    with open("parking_layout.json.tmp", "w") as f:
+        json.dump(layout, f, indent=4)
+    os.replace("parking_layout.json.tmp", "parking_layout.json")
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
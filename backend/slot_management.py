@@ -1,108 +1,171 @@
 import cv2
-import json
-from ultralytics import YOLO
+import itertools
+import logging
+import threading
+from collections import OrderedDict
 import numpy as np
+from backend.layouts import layouts, DEFAULT_LAYOUT
+from backend.metrics import STAGE_SECONDS
+from backend.model_registry import registry
+from backend.occupancy import OccupancyEngine, detections_from_results
+from backend.tiling import detect_tiled
 
-# Load the YOLOv8 model
-model_path = r'./models/yolov8m.pt' # working the best yolov8m
-model = YOLO(model_path)
+logger = logging.getLogger(__name__)
 
-# Load parking layout configuration
-with open("parking_layout.json", "r") as f:
-    parking_layout = json.load(f)
+def __getattr__(name):
+    # The YOLOv8 model lives in the registry and loads on first use
+    if name == "model":
+        return registry.get("vehicle_detector")
+    # The layout and its compiled ROIs come from the layout service, which hot-reloads the file
+    if name == "parking_layout":
+        return layouts.get().data
+    if name == "occupancy_engine":
+        return layouts.get().engine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def process_image(image_path):
+# The vehicle detector is shared by API requests, uploads, the lot monitor and warmup, and is not thread-safe
+_inference_lock = threading.Lock()
+
+def warmup():
+    """Loads the vehicle detector and runs its dummy inference, under the inference lock."""
+    with _inference_lock:
+        registry.warmup(["vehicle_detector"])
+
+def warmup_in_background() -> threading.Thread:
+    """Runs `warmup` on a daemon thread so start-up is not held up by model loading."""
+    thread = threading.Thread(target=warmup, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+# Recently analysed frames, kept so they can be rendered on demand without re-running the model
+MAX_FRAMES = 4
+_frames = OrderedDict()  # frame_id -> {"img", "layout", "boxes", "scores", "occupancy", "jpeg"}
+_frame_ids = itertools.count(1)
+_frames_lock = threading.Lock()
+
+def analyze(img, layout_name=DEFAULT_LAYOUT):
+    """
+    Runs detection once on an image and determines slot occupancy against the named layout.
+    The detections are retained under a new frame id for later rendering.
+
+    Returns:
+        Tuple of (frame_id, {slot_id: occupied}).
+    """
+    return analyze_batch([img], layout_name)[0]
+
+def analyze_batch(imgs, layout_name=DEFAULT_LAYOUT):
+    """
+    Like analyze, for several images of the same layout in one detector call (or, when
+    the layout configures tiling, in batches of ROI tiles).
+
+    Returns:
+        List of (frame_id, {slot_id: occupied}), one per image in order.
+    """
+    layout = layouts.get(layout_name)
+    model = registry.get("vehicle_detector")
+    with _inference_lock, STAGE_SECONDS.time(stage="vehicle_inference"):
+        if layout.inference is None:
+            detections = [detections_from_results([result]) for result in model(list(imgs), verbose=False)]
+        else:
+            # Only the region around the slots is searched, in tiles at the model's native resolution
+            detections = detect_tiled(model, list(imgs), layout.rois, layout.inference)
+    analysed = []
+    for img, (boxes, scores) in zip(imgs, detections):
+        with STAGE_SECONDS.time(stage="occupancy_match"):
+            occupied, _, _ = layout.engine.match(boxes, scores)
+        slot_occupancy_status = dict(zip(layout.slot_ids, occupied.tolist()))
+
+        with _frames_lock:
+            frame_id = next(_frame_ids)
+            _frames[frame_id] = {"img": img, "layout": layout, "boxes": boxes, "scores": scores,
+                                 "occupancy": slot_occupancy_status, "jpeg": None}
+            while len(_frames) > MAX_FRAMES:
+                _frames.popitem(last=False)
+        analysed.append((frame_id, slot_occupancy_status))
+    return analysed
+
+def latest_frame_id():
+    with _frames_lock:
+        return next(reversed(_frames), None)
+
+def render_frame(frame_id=None):
+    """
+    Returns (frame_id, JPEG bytes) of an annotated frame, the latest one by default.
+    Each frame is encoded at most once. Raises KeyError if the frame is no longer kept.
+    """
+    with _frames_lock:
+        if frame_id is None:
+            frame_id = next(reversed(_frames), None)
+        frame = _frames[frame_id]
+        if frame["jpeg"] is not None:
+            return frame_id, frame["jpeg"]
+
+    annotated = annotate(frame["img"], frame["boxes"], frame["scores"], frame["occupancy"], frame["layout"])
+    ok, buffer = cv2.imencode(".jpg", annotated)
+    if not ok:
+        raise ValueError("Could not encode annotated frame")
+    frame["jpeg"] = buffer.tobytes()
+    return frame_id, frame["jpeg"]
+
+def process_image(image_path, show=False, layout_name=DEFAULT_LAYOUT):
     """
-    Processes the image to detect vehicles and determine slot occupancy.
+    Processes the image (a file path, or an already decoded BGR array such as an
+    upload) to detect vehicles and determine slot occupancy.
+    Headless by default; pass show=True to open and save the visualization.
     """
     try:
-        # 1. Load the image
-        img = cv2.imread(image_path)
+        # 1. Load the image, unless it is already decoded
+        img = image_path if isinstance(image_path, np.ndarray) else cv2.imread(image_path)
         if img is None:
             raise ValueError("Image not found or invalid")
 
-        # 2. Run YOLOv8 detection
-        results = model(img)
-
-        # 3. Determine slot occupancy
-        slot_occupancy_status = {}
-        for slot in parking_layout["slots"]:
-            slot_id = slot["id"]
-            slot_roi = slot["roi"]
-            slot_occupancy_status[slot_id] = is_slot_occupied(img, slot_roi, results)
-        
-        # 4. Visualize the results
-        visualize_results(img, slot_occupancy_status)
-        
-        # 5. Return the occupancy status of each slot
+        # 2. Run YOLOv8 detection once and determine slot occupancy
+        frame_id, slot_occupancy_status = analyze(img, layout_name)
+
+        # 3. Visualize the results, reusing the same detections
+        if show:
+            frame = _frames.get(frame_id)
+            if frame is not None:
+                visualize_results(img, slot_occupancy_status, frame["boxes"], frame["scores"], frame["layout"])
+
+        # 4. Return the occupancy status of each slot
         return slot_occupancy_status
 
     except Exception as e:
-        import traceback
-        print(f"Error processing image: {e}")
-        traceback.print_exc()  # Print full traceback for debugging
+        logger.exception("Error processing image: %s", e)  # Includes the full traceback for debugging
         return None
 
 def is_slot_occupied(img, slot_roi, results, iou_threshold=0.5):
-    x1, y1, x2, y2 = slot_roi
-    slot_area = (x2 - x1) * (y2 - y1)
-    
-    for result in results:
-        boxes = result.boxes.xyxy.cpu().numpy().astype(int)
-        scores = result.boxes.conf.cpu().numpy()
-        
-        for i, box in enumerate(boxes):
-            if scores[i] < 0.5:
-                continue
-                
-            bx1, by1, bx2, by2 = box
-            
-            # Calculate intersection
-            inter_x1 = max(x1, bx1)
-            inter_y1 = max(y1, by1)
-            inter_x2 = min(x2, bx2)
-            inter_y2 = min(y2, by2)
-            
-            if inter_x1 < inter_x2 and inter_y1 < inter_y2:
-                inter_area = (inter_x2 - inter_x1) * (inter_y2 - inter_y1)
-                box_area = (bx2 - bx1) * (by2 - by1)
-                union_area = slot_area + box_area - inter_area
-                iou = inter_area / union_area
-                
-                if iou > iou_threshold:
-                    return True
-    
-    return False
-
-def visualize_results(img, slot_occupancy_status):
+    """Checks a single slot; process_image scores every slot at once through the layout's engine."""
+    engine = OccupancyEngine([{"id": "slot", "roi": slot_roi}], iou_threshold=iou_threshold)
+    occupied, _, _ = engine.match(*detections_from_results(results))
+    return bool(occupied[0])
+
+def annotate(img, boxes, scores, slot_occupancy_status, layout=None):
     """
-    Visualizes the parking slots and their occupancy status on the image.
+    Draws detections and slot occupancy on a copy of the image.
     Red = Occupied, Green = Free
     """
+    layout = layout or layouts.get()
     img_copy = img.copy()
-    
+
     # Draw detection boxes from YOLO first (so they're below the parking slots)
-    for result in model(img):
-        boxes = result.boxes.xyxy.cpu().numpy().astype(int)
-        scores = result.boxes.conf.cpu().numpy()
-        
-        for i, box in enumerate(boxes):
-            if scores[i] < 0.5:  # Match the threshold from is_slot_occupied
-                continue
-                
-            bx1, by1, bx2, by2 = box
-            cv2.rectangle(img_copy, (bx1, by1), (bx2, by2), (255, 0, 0), 2)  # Blue for detected vehicles
-            cv2.putText(img_copy, f"{scores[i]:.2f}", (bx1, by1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-    
+    for box, score in zip(boxes.astype(int), scores):
+        if score < layout.engine.conf_threshold:  # Match the threshold used for occupancy
+            continue
+
+        bx1, by1, bx2, by2 = box
+        cv2.rectangle(img_copy, (bx1, by1), (bx2, by2), (255, 0, 0), 2)  # Blue for detected vehicles
+        cv2.putText(img_copy, f"{score:.2f}", (bx1, by1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+
     # Draw parking slots
     occupied_count = 0
     free_count = 0
-    
-    for slot in parking_layout["slots"]:
+
+    for slot in layout.slots:
         slot_id = slot["id"]
         x1, y1, x2, y2 = slot["roi"]
-        
-        # FIX: Red for occupied, Green for free (corrected)
+
         is_occupied = slot_occupancy_status[slot_id]
         if is_occupied:
             color = (0, 0, 255)  # Red for occupied
@@ -110,25 +173,32 @@ def visualize_results(img, slot_occupancy_status):
         else:
             color = (0, 255, 0)  # Green for free
             free_count += 1
-            
+
         cv2.rectangle(img_copy, (x1, y1), (x2, y2), color, 2)
         cv2.putText(img_copy, f"ID: {slot_id}", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-    
+
     # Add summary text
-    cv2.putText(img_copy, f"Occupied: {occupied_count}, Free: {free_count}", 
+    cv2.putText(img_copy, f"Occupied: {occupied_count}, Free: {free_count}",
                 (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-    
+    return img_copy
+
+def visualize_results(img, slot_occupancy_status, boxes, scores, layout=None, save_path="parking_visualization.jpg"):
+    """
+    Displays the annotated image in a window and saves it (interactive use only).
+    """
+    img_copy = annotate(img, boxes, scores, slot_occupancy_status, layout)
+
     # Display the image
     cv2.imshow("Parking Slots", img_copy)
     cv2.waitKey(0)
     cv2.destroyAllWindows()
-    
+
     # Save the visualization
-    cv2.imwrite("parking_visualization.jpg", img_copy)
+    cv2.imwrite(save_path, img_copy)
 
 if __name__ == "__main__":
     image_path = "../videos/parking_layout_setup.jpg"  # Adjust the path if needed
-    slot_status = process_image(image_path)
+    slot_status = process_image(image_path, show=True)
 
     if slot_status:
         print("Slot Occupancy Status:")
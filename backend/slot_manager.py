@@ -0,0 +1,143 @@
+import heapq
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from backend import database
+from backend.layouts import layouts, DEFAULT_LAYOUT
+
+logger = logging.getLogger(__name__)
+
+class SlotManager:
+    def __init__(self, layout_name: str = DEFAULT_LAYOUT, entrance: Optional[Tuple[float, float]] = None) -> None:
+        """
+        Assigns parking slots to vehicles as they enter, best slot first.
+
+        Free slots sit in a min-heap keyed by (layout "priority" field, distance from
+        `entrance` to the slot centre, slot number), so lower priority values or zones
+        fill first, then slots nearest the entrance. Allocation and release are O(log n):
+        heap entries for slots that stop being free are dropped lazily when they surface.
+
+        A slot is free when no open session holds it and the lot camera does not see a
+        vehicle in it. Vision-occupied slots are blocked rather than assigned, so a car
+        parked without a session (or in the wrong slot) is never double-booked.
+
+        Args:
+            layout_name (str): Layout whose slots are managed.
+            entrance (Optional[Tuple[float, float]]): Entrance position in layout pixels.
+        """
+        self.layout_name = layout_name
+        self.entrance = entrance
+        self._layout = None
+        self._keys = {}  # slot number -> heap key
+        self._heap = []
+        self._free = set()
+        self._assigned = {}  # slot number -> record id
+        self._blocked = set()  # vision-occupied slots with no session
+        self._lock = threading.Lock()
+
+    def _slot_key(self, slot: dict, number: int) -> tuple:
+        x1, y1, x2, y2 = slot["roi"]
+        distance = 0.0
+        if self.entrance is not None:
+            distance = ((x1 + x2) / 2 - self.entrance[0]) ** 2 + ((y1 + y2) / 2 - self.entrance[1]) ** 2
+        return (slot.get("priority", 0), distance, number)
+
+    def _sync_layout(self) -> None:
+        """Rebuilds the heap (O(n)) only when the layout file has been reloaded."""
+        layout = layouts.get(self.layout_name)
+        if layout is self._layout:
+            return
+        self._layout = layout
+        numbers = layout.slot_numbers
+        self._keys = {numbers[slot["id"]]: self._slot_key(slot, numbers[slot["id"]]) for slot in layout.slots}
+        removed = set(self._assigned) - set(self._keys)
+        if removed:
+            logger.warning("Slots %s left layout %s while assigned", sorted(removed), self.layout_name)
+        self._blocked &= set(self._keys)
+        self._free = set(self._keys) - set(self._assigned) - self._blocked
+        self._heap = [self._keys[number] for number in self._free]
+        heapq.heapify(self._heap)
+
+    def recover(self) -> int:
+        """
+        Reloads the assignments of vehicles still inside from the database (one query over
+        the open sessions only) and rebuilds the free heap. Returns the number recovered.
+        """
+        assignments = database.get_open_slot_assignments()
+        with self._lock:
+            self._assigned = assignments
+            self._layout = None
+            self._sync_layout()
+        logger.info("Recovered %d slot assignments for layout %s", len(assignments), self.layout_name)
+        return len(assignments)
+
+    def _pop_free(self) -> Optional[int]:
+        while self._heap:
+            number = heapq.heappop(self._heap)[-1]
+            if number in self._free:
+                self._free.discard(number)
+                return number
+        return None
+
+    def _push_free(self, number: int) -> None:
+        if number in self._keys and number not in self._free:
+            self._free.add(number)
+            heapq.heappush(self._heap, self._keys[number])
+            if len(self._heap) > 2 * len(self._keys):
+                # Too many stale entries from slots blocked while free; compact
+                self._heap = [self._keys[free] for free in self._free]
+                heapq.heapify(self._heap)
+
+    def assign(self, record_id: int) -> Optional[int]:
+        """Assigns the best free slot to a parking record and persists it; None if the lot is full."""
+        with self._lock:
+            self._sync_layout()
+            number = self._pop_free()
+            if number is None:
+                return None
+            self._assigned[number] = record_id
+        if not database.set_slot_number(record_id, number):
+            with self._lock:
+                self._assigned.pop(number, None)
+                self._push_free(number)
+            return None
+        return number
+
+    def release(self, number: Optional[int]) -> None:
+        """Frees a slot when its session closes."""
+        if number is None:
+            return
+        with self._lock:
+            self._sync_layout()
+            if self._assigned.pop(number, None) is not None and number not in self._blocked:
+                self._push_free(number)
+
+    def reconcile(self, states: Dict[str, bool]) -> None:
+        """
+        Applies vision occupancy ({slot_id: occupied}, full or partial, e.g. a
+        monitor delta). Unassigned slots seen occupied are blocked; blocked slots seen
+        empty become free again. Assigned slots are left alone, since their vehicle
+        may still be on its way.
+        """
+        with self._lock:
+            self._sync_layout()
+            for slot_id, occupied in states.items():
+                if occupied is None:
+                    continue
+                number = self._layout.slot_numbers.get(slot_id)
+                if number not in self._keys or number in self._assigned:
+                    continue
+                if occupied:
+                    self._blocked.add(number)
+                    self._free.discard(number)  # its heap entry is dropped when it surfaces
+                elif number in self._blocked:
+                    self._blocked.discard(number)
+                    self._push_free(number)
+
+    def status(self) -> dict:
+        with self._lock:
+            self._sync_layout()
+            return {"layout": self.layout_name, "total": len(self._keys), "free": len(self._free),
+                    "assigned": {str(number): record_id for number, record_id in sorted(self._assigned.items())},
+                    "blocked": sorted(self._blocked)}
@@ -0,0 +1,170 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.occupancy import detections_from_results
+
+Region = Tuple[int, int, int, int]  # x1, y1, x2, y2 in image pixels
+
+class TilingConfig:
+    def __init__(self, tile_size: Optional[int] = None, tile_overlap: float = 0.2, margin: int = 32,
+                 imgsz: Optional[int] = None, tile_batch: int = 8, nms_iou: float = 0.5,
+                 nms_ios: float = 0.5) -> None:
+        """
+        How the vehicle detector covers a lot image; read from a layout's "inference" section.
+
+        Detection only runs inside the bounding region of the layout's slot ROIs, split
+        into overlapping square tiles so small, distant cars in high-resolution views are
+        not downscaled away. Detections from all tiles are merged with NMS.
+
+        Args:
+            tile_size (Optional[int]): Tile edge in image pixels. None runs the whole ROI
+                region as a single crop.
+            tile_overlap (float): Fraction of a tile shared with its neighbours, so a car on
+                a tile edge is seen whole in at least one tile.
+            margin (int): Pixels added around the ROI region, for cars overhanging their slot.
+            imgsz (Optional[int]): Model input size per tile; defaults to tile_size.
+            tile_batch (int): Tiles per model call. The model is shared and not thread-safe,
+                so tiles run in parallel along the batch dimension.
+            nms_iou (float): Overlapping detections above this IoU are merged.
+            nms_ios (float): Detections from different tiles whose overlap covers this fraction
+                of the smaller one are merged into one box: the pieces of a car cut by tile edges.
+        """
+        if tile_size is not None and tile_size < 32:
+            raise ValueError(f"tile_size must be at least 32 pixels, not {tile_size}")
+        if not 0 <= tile_overlap < 1:
+            raise ValueError(f"tile_overlap must be in [0, 1), not {tile_overlap}")
+        if tile_batch < 1:
+            raise ValueError(f"tile_batch must be positive, not {tile_batch}")
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.margin = max(0, margin)
+        self.imgsz = imgsz or tile_size
+        self.tile_batch = tile_batch
+        self.nms_iou = nms_iou
+        self.nms_ios = nms_ios
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["TilingConfig"]:
+        """Builds the config from a layout's "inference" section; None when there is none."""
+        if data is None:
+            return None
+        try:
+            return cls(**data)
+        except TypeError as e:
+            raise ValueError(f"Invalid inference settings: {e}") from e
+
+    def model_kwargs(self) -> dict:
+        kwargs = {"verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        return kwargs
+
+def roi_region(rois: np.ndarray, margin: int, shape: Sequence[int]) -> Optional[Region]:
+    """Bounding box of all slot ROIs grown by `margin` and clipped to an image of `shape`; None if empty."""
+    if not len(rois):
+        return None
+    height, width = shape[:2]
+    x1 = max(0, int(np.floor(rois[:, 0].min())) - margin)
+    y1 = max(0, int(np.floor(rois[:, 1].min())) - margin)
+    x2 = min(width, int(np.ceil(rois[:, 2].max())) + margin)
+    y2 = min(height, int(np.ceil(rois[:, 3].max())) + margin)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+def _spans(start: int, end: int, size: int, stride: int) -> List[Tuple[int, int]]:
+    if end - start <= size:
+        return [(start, end)]
+    # Evenly strided tiles, with the last one flush against the end
+    return [(position, position + size) for position in range(start, end - size, stride)] + [(end - size, end)]
+
+def tile_grid(region: Region, tile_size: Optional[int], overlap: float) -> List[Region]:
+    """Overlapping tiles of at most `tile_size` pixels covering `region`, row by row."""
+    if tile_size is None:
+        return [region]
+    x1, y1, x2, y2 = region
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [(tx1, ty1, tx2, ty2)
+            for ty1, ty2 in _spans(y1, y2, tile_size, stride)
+            for tx1, tx2 in _spans(x1, x2, tile_size, stride)]
+
+def merge_detections(boxes: np.ndarray, scores: np.ndarray, tiles: np.ndarray, iou_threshold: float = 0.5,
+                     ios_threshold: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy class-agnostic NMS over xyxy boxes, best score first. Besides IoU, a box from
+    another tile (`tiles` holds each box's tile index) is merged into a better one when
+    their intersection covers `ios_threshold` of the smaller box: the better box grows to
+    cover both, so the pieces of a car cut by tile edges become one whole box.
+
+    Returns:
+        Tuple of (boxes, scores) of the kept detections, best first.
+    """
+    order = np.argsort(-scores, kind="stable")
+    boxes = boxes[order].astype(np.float64)
+    scores = scores[order]
+    tiles = tiles[order]
+    areas = np.maximum(boxes[:, 2] - boxes[:, 0], 0) * np.maximum(boxes[:, 3] - boxes[:, 1], 0)
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in range(len(boxes)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        rest = np.arange(i + 1, len(boxes))
+        rest = rest[~suppressed[rest]]
+        if not rest.size:
+            break
+        inter_w = np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0])
+        inter_h = np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1])
+        inter = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            iou = inter / (areas[i] + areas[rest] - inter)
+            ios = inter / np.minimum(areas[i], areas[rest])
+        fragments = (ios > ios_threshold) & (tiles[rest] != tiles[i])
+        if fragments.any():
+            pieces = rest[fragments]
+            boxes[i, :2] = np.minimum(boxes[i, :2], boxes[pieces, :2].min(axis=0))
+            boxes[i, 2:] = np.maximum(boxes[i, 2:], boxes[pieces, 2:].max(axis=0))
+        suppressed[rest[(iou > iou_threshold) | fragments]] = True
+    return boxes[keep].astype(np.float32), scores[keep]
+
+def detect_tiled(model, imgs: List[np.ndarray], rois: np.ndarray,
+                 config: TilingConfig) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Runs `model` over the ROI tiles of every image, `config.tile_batch` tiles per call.
+    Tiles are views into the images, so nothing is copied before the model's own resize.
+
+    Returns:
+        One (boxes, scores) pair per image, in full-image coordinates after cross-tile NMS.
+    """
+    tiles = []  # (image index, tile)
+    for index, img in enumerate(imgs):
+        region = roi_region(rois, config.margin, img.shape)
+        if region is not None:
+            tiles.extend((index, tile) for tile in tile_grid(region, config.tile_size, config.tile_overlap))
+
+    boxes = [[] for _ in imgs]
+    scores = [[] for _ in imgs]
+    tile_ids = [[] for _ in imgs]
+    for start in range(0, len(tiles), config.tile_batch):
+        chunk = tiles[start:start + config.tile_batch]
+        crops = [imgs[index][y1:y2, x1:x2] for index, (x1, y1, x2, y2) in chunk]
+        results = model(crops, **config.model_kwargs())
+        for tile_id, ((index, (x1, y1, _, _)), result) in enumerate(zip(chunk, results), start):
+            tile_boxes, tile_scores = detections_from_results([result])
+            boxes[index].append(tile_boxes + np.array([x1, y1, x1, y1], dtype=tile_boxes.dtype))
+            scores[index].append(tile_scores)
+            tile_ids[index].append(np.full(len(tile_scores), tile_id, dtype=np.intp))
+
+    detections = []
+    for image_boxes, image_scores, image_tiles in zip(boxes, scores, tile_ids):
+        if not image_boxes:
+            detections.append((np.empty((0, 4), dtype=np.float32), np.empty((0,), dtype=np.float32)))
+            continue
+        merged_boxes, merged_scores = np.concatenate(image_boxes), np.concatenate(image_scores)
+        if len(image_boxes) > 1:
+            merged_boxes, merged_scores = merge_detections(merged_boxes, merged_scores, np.concatenate(image_tiles),
+                                                           config.nms_iou, config.nms_ios)
+        detections.append((merged_boxes, merged_scores))
+    return detections
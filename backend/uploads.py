@@ -0,0 +1,82 @@
+import io
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+import cv2
+import numpy as np
+from starlette.datastructures import FormData
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.requests import Request
+
+# Whole multipart bodies are capped at this size; every part of a capped body then fits the
+# in-memory spool, so uploads are never written to temp files
+MAX_UPLOAD_BYTES = 64 * 1024 * 1024
+MAX_UPLOAD_FILES = 256
+
+class UploadTooLarge(Exception):
+    pass
+
+class _InMemoryMultiPartParser(MultiPartParser):
+    # Scoped to the upload endpoints; other forms keep Starlette's 1 MB spool
+    spool_max_size = MAX_UPLOAD_BYTES
+
+async def _capped(stream: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(f"Uploads are limited to {limit} bytes")
+        yield chunk
+
+@asynccontextmanager
+async def upload_form(request: Request, limit: int = MAX_UPLOAD_BYTES) -> AsyncIterator[FormData]:
+    """
+    Parses a multipart request body in memory and closes its files on exit.
+
+    The body is counted as it streams in, so a request over `limit` is rejected as soon
+    as it crosses it (or up front, from its Content-Length) rather than after parsing.
+
+    Raises:
+        UploadTooLarge: The body is larger than `limit`.
+        ValueError: The body is not valid multipart form data.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise UploadTooLarge(f"Uploads are limited to {limit} bytes")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise ValueError("Expected multipart/form-data")
+    parser = _InMemoryMultiPartParser(request.headers, _capped(request.stream(), limit), max_files=MAX_UPLOAD_FILES)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise ValueError(str(e)) from e
+    try:
+        yield form
+    finally:
+        await form.close()
+
+def decode_image(buffer) -> np.ndarray:
+    """Decodes a JPEG/PNG from any bytes-like object without copying it first."""
+    img = cv2.imdecode(np.frombuffer(buffer, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return img
+
+@contextmanager
+def open_clip(data: bytes) -> Iterator[cv2.VideoCapture]:
+    """
+    Opens an in-memory video clip. OpenCV's FFmpeg backend reads it straight from the
+    buffer (OpenCV 4.10+), so no temporary file is written. The capture only borrows
+    the stream, so it is released before the stream goes out of scope.
+    """
+    stream = io.BytesIO(data)  # wraps the bytes without copying them
+    try:
+        cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+    except (TypeError, cv2.error) as e:
+        raise ValueError(f"Reading clips from memory needs OpenCV 4.10 or newer: {e}") from e
+    try:
+        if not cap.isOpened():
+            raise ValueError("Could not decode video clip")
+        yield cap
+    finally:
+        cap.release()
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from typing import Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from backend import models
+from backend.layouts import layouts, DEFAULT_LAYOUT
+
+def _slot_statuses(states: Dict[str, bool], layout: str) -> list:
+    """
+    Serializes {slot_id: occupied} as SlotStatus dicts, skipping slots not yet observed
+    and slots no longer in the layout.
+    """
+    numbers = layouts.get(layout).slot_numbers
+    return [
+        dict(models.SlotStatus(slot_number=numbers[slot_id], is_available=not occupied))
+        for slot_id, occupied in states.items()
+        if occupied is not None and slot_id in numbers
+    ]
+
+class Subscriber:
+    def __init__(self, max_queue: int) -> None:
+        """
+        Per-client outbox. When a slow client lets `max_queue` deltas pile up, they
+        are coalesced into a single delta carrying only each slot's latest state.
+        """
+        self.max_queue = max_queue
+        self.coalesced = 0
+        self._queue = []
+        self._ready = asyncio.Event()
+
+    def push(self, delta: Dict[str, bool]) -> None:
+        if len(self._queue) >= self.max_queue:
+            merged = {}
+            for queued in self._queue:
+                merged.update(queued)
+            merged.update(delta)
+            self._queue = [merged]
+            self.coalesced += 1
+        else:
+            self._queue.append(delta)
+        self._ready.set()
+
+    async def get(self) -> Dict[str, bool]:
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._queue.pop(0)
+
+class OccupancyBroadcaster:
+    def __init__(self, max_queue: int = 16) -> None:
+        """
+        Single source of truth for slot states, fanned out to any number of WebSocket clients.
+        Producers on any thread call `update`; clients receive a snapshot and then deltas only.
+        Each layout (camera) has its own snapshot and subscribers, since layouts share slot ids.
+
+        Args:
+            max_queue (int): Deltas buffered per client before coalescing kicks in.
+        """
+        self.max_queue = max_queue
+        self.snapshots = {}  # layout name -> {slot_id: occupied}
+        self._subscribers = {}  # layout name -> set of Subscriber
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Binds the broadcaster to the event loop serving the WebSocket clients."""
+        self._loop = loop
+
+    def update(self, states: Dict[str, bool], layout: str = DEFAULT_LAYOUT) -> None:
+        """
+        Publishes slot states (full or partial) of a layout; only slots whose state
+        differs from that layout's snapshot are sent. Safe to call from any thread.
+        """
+        with self._lock:
+            snapshot = self.snapshots.setdefault(layout, {})
+            delta = {slot_id: occupied for slot_id, occupied in states.items()
+                     if occupied is not None and snapshot.get(slot_id) != occupied}
+            if not delta:
+                return
+            snapshot.update(delta)
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(layout, delta)
+        else:
+            self._loop.call_soon_threadsafe(self._fan_out, layout, delta)
+
+    def _fan_out(self, layout: str, delta: Dict[str, bool]) -> None:
+        for subscriber in list(self._subscribers.get(layout, ())):
+            subscriber.push(delta)
+
+    def subscribe(self, layout: str = DEFAULT_LAYOUT):
+        """Registers a client of a layout and returns (subscriber, snapshot copy). Call from the event loop."""
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            snapshot = dict(self.snapshots.get(layout, {}))
+            self._subscribers.setdefault(layout, set()).add(subscriber)
+        return subscriber, snapshot
+
+    def unsubscribe(self, subscriber: Subscriber, layout: str = DEFAULT_LAYOUT) -> None:
+        self._subscribers.get(layout, set()).discard(subscriber)
+
+    @property
+    def client_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+    except (WebSocketDisconnect, RuntimeError):
+        return
+
+async def stream_occupancy(websocket: WebSocket, broadcaster: OccupancyBroadcaster,
+                           layout: str = DEFAULT_LAYOUT) -> None:
+    """
+    Serves one client of a layout: a snapshot message, then a delta message per change.
+
+    Messages are {"type": "snapshot" | "delta", "slots": [SlotStatus, ...]}.
+    """
+    await websocket.accept()
+    subscriber, snapshot = broadcaster.subscribe(layout)
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        await websocket.send_json({"type": "snapshot", "slots": _slot_statuses(snapshot, layout)})
+        while True:
+            next_delta = asyncio.create_task(subscriber.get())
+            done, _ = await asyncio.wait({next_delta, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                next_delta.cancel()
+                break
+            await websocket.send_json({"type": "delta", "slots": _slot_statuses(next_delta.result(), layout)})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(subscriber, layout)
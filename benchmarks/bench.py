@@ -0,0 +1,265 @@
+"""
+Offline CPU benchmarks for the plate pipeline, slot occupancy and database helpers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench                      # stub models, synthetic feeds
+    python -m benchmarks.bench --real-models        # real YOLO/PaddleOCR weights
+    python -m benchmarks.bench --feed recorded      # the clips and layout in videos/
+    python -m benchmarks.bench --save-baseline      # store results as the new baseline
+
+Each benchmark runs in its own process so that peak RSS is per benchmark. Results are
+compared against the baseline file when it exists; the exit status is 1 if any metric
+regressed by more than --tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+RECORDED_VIDEO = REPO_DIR / "videos" / "entry_capture_feed.mp4"
+RECORDED_IMAGE = REPO_DIR / "videos" / "parking_layout_setup.jpg"
+BENCH_LAYOUT = "bench"
+
+# Metric -> True when larger is better; used for the baseline comparison
+METRICS = {"fps": True, "p50_ms": False, "p99_ms": False, "peak_rss_mb": False}
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+def _summary(latencies, items: int, elapsed: float) -> dict:
+    latencies_ms = np.asarray(latencies) * 1000.0
+    return {"iterations": len(latencies), "fps": items / elapsed if elapsed else 0.0,
+            "p50_ms": float(np.percentile(latencies_ms, 50)), "p99_ms": float(np.percentile(latencies_ms, 99)),
+            "peak_rss_mb": _peak_rss_mb()}
+
+def _timed(fn, iterations: int, warmup: int):
+    """Calls `fn` warmup + iterations times; returns (latencies of the timed calls, elapsed seconds)."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call_start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start
+
+def _setup(options: dict, workdir: str) -> dict:
+    """Installs stubs if asked and prepares the feeds; runs inside the benchmark process."""
+    sys.path.insert(0, str(REPO_DIR))
+    from benchmarks import stubs
+    from backend import layouts
+
+    if not options["real_models"]:
+        stubs.install(options["stub_delay_ms"], options["stub_delay_ms"], options["stub_delay_ms"])
+    width, height = options["frame_size"]
+    if options["feed"] == "recorded":
+        feeds = {"video": str(RECORDED_VIDEO), "image": str(RECORDED_IMAGE), "layout": layouts.DEFAULT_LAYOUT,
+                 "workdir": workdir}
+    else:
+        video = stubs.write_plate_video(Path(workdir) / "gate.avi", width, height, options["frames"])
+        image, layout_path = stubs.write_lot_scene(workdir, options["slots"], width, height)
+        layouts.layouts.register(BENCH_LAYOUT, layout_path)
+        feeds = {"video": video, "image": image, "layout": BENCH_LAYOUT, "workdir": workdir}
+    return feeds
+
+def bench_extract_number_plate(options: dict, feeds: dict) -> dict:
+    from backend import metrics, number_plate_recognition
+
+    # The OCR cache would answer every repeat run; clear it so each iteration does the full read.
+    # vote_plate_text bound the cache object as its default, so it must be emptied, not replaced.
+    def run():
+        number_plate_recognition.ocr_cache.clear()
+        number_plate_recognition.extract_number_plate(feeds["video"])
+    for _ in range(options["warmup"]):
+        run()
+    frames_before = metrics.FRAMES_PROCESSED.value()
+    latencies, elapsed = _timed(run, options["iterations"], 0)
+    return _summary(latencies, metrics.FRAMES_PROCESSED.value() - frames_before, elapsed)
+
+def bench_process_frame(options: dict, feeds: dict) -> dict:
+    import cv2
+    from backend.number_plate_recognition import PlateDetector
+
+    cap = cv2.VideoCapture(feeds["video"])
+    frames = []
+    while len(frames) < options["frames"]:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise RuntimeError(f"Could not read frames from {feeds['video']}")
+
+    detector = PlateDetector(conf_threshold=0.85)
+    position = iter(range(sys.maxsize))
+    def run():
+        detector.process_frame(frames[next(position) % len(frames)])
+    latencies, elapsed = _timed(run, options["iterations"] * len(frames), options["warmup"])
+    return _summary(latencies, len(latencies), elapsed)
+
+def bench_process_image(options: dict, feeds: dict) -> dict:
+    from backend import slot_management
+
+    def run():
+        if slot_management.process_image(feeds["image"], layout_name=feeds["layout"]) is None:
+            raise RuntimeError(f"process_image failed on {feeds['image']}")
+    latencies, elapsed = _timed(run, options["iterations"], options["warmup"])
+    return _summary(latencies, len(latencies), elapsed)
+
+def bench_is_slot_occupied(options: dict, feeds: dict) -> dict:
+    import cv2
+    from backend import layouts, slot_management
+    from backend.model_registry import registry
+
+    img = cv2.imread(feeds["image"])
+    results = registry.get("vehicle_detector")(img, verbose=False)
+    rois = layouts.layouts.get(feeds["layout"]).rois
+    def run():
+        for roi in rois:
+            slot_management.is_slot_occupied(img, roi, results)
+    latencies, elapsed = _timed(run, options["iterations"], options["warmup"])
+    return _summary(latencies, len(latencies) * len(rois), elapsed)  # fps counts slots checked
+
+def bench_database(options: dict, feeds: dict) -> dict:
+    from backend import database
+
+    database.DATABASE_DIR = Path(feeds["workdir"]) / "database"
+    database.DATABASE_FILE = database.DATABASE_DIR / "bench.db"
+    database.create_tables()
+    plates = [f"BENCH{index:05d}" for index in range(options["records"])]
+    latencies = []
+    start = time.perf_counter()
+    # One "visit" is an entry, a lookup and an exit, the calls the gates make per vehicle
+    for number_plate in plates:
+        call_start = time.perf_counter()
+        database.insert_parking_record(number_plate)
+        database.get_entry_record(number_plate)
+        database.update_parking_record(number_plate)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    database.close_pool()
+    return _summary(latencies, len(latencies), elapsed)
+
+BENCHMARKS = {
+    "extract_number_plate": bench_extract_number_plate,
+    "process_frame": bench_process_frame,
+    "process_image": bench_process_image,
+    "is_slot_occupied": bench_is_slot_occupied,
+    "database": bench_database,
+}
+
+def _run_one(name: str, options: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="parking-bench-") as workdir:
+        feeds = _setup(options, workdir)
+        return BENCHMARKS[name](options, feeds)
+
+def run(names, options: dict) -> dict:
+    """Runs each named benchmark in a fresh process and returns {name: summary}."""
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(_run_one, name, options).result()
+            except Exception as e:
+                results[name] = {"error": str(e)}
+        print(_format_row(name, results[name]), flush=True)
+    return results
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Returns (benchmark, metric, baseline value, current value, relative change) for each regression."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((name, metric, before, after, change))
+    return regressions
+
+def _format_row(name: str, summary: dict) -> str:
+    if "error" in summary:
+        return f"{name:<22} ERROR {summary['error']}"
+    return (f"{name:<22} {summary['fps']:>10.1f} fps  p50 {summary['p50_ms']:>8.2f} ms  "
+            f"p99 {summary['p99_ms']:>8.2f} ms  peak RSS {summary['peak_rss_mb']:>7.1f} MB")
+
+def _frame_size(value: str):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline CPU benchmarks for the parking backend.")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+                        help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}.")
+    parser.add_argument("--real-models", action="store_true", help="Use the real YOLO/PaddleOCR models instead of stubs.")
+    parser.add_argument("--feed", choices=["synthetic", "recorded"], default="synthetic",
+                        help="Synthetic frames/layouts, or the recorded clip, image and default layout in videos/.")
+    parser.add_argument("--frame-size", type=_frame_size, default=(1280, 720), help="Synthetic frame size, WIDTHxHEIGHT.")
+    parser.add_argument("--frames", type=int, default=120, help="Frames in the synthetic gate clip.")
+    parser.add_argument("--slots", type=int, default=40, help="Slots in the synthetic lot layout.")
+    parser.add_argument("--records", type=int, default=2000, help="Vehicle visits for the database benchmark.")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed iterations per benchmark.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed iterations before timing.")
+    parser.add_argument("--stub-delay-ms", type=float, default=0.0, help="Per-call latency added to every stub model.")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline results file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results to the baseline file.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative change counted as a regression.")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    options = {"real_models": args.real_models, "feed": args.feed, "frame_size": args.frame_size,
+               "frames": args.frames, "slots": args.slots, "records": args.records,
+               "iterations": args.iterations, "warmup": args.warmup, "stub_delay_ms": args.stub_delay_ms}
+    config = {**options, "frame_size": "x".join(map(str, args.frame_size)),
+              "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()}
+    print(f"Config: {json.dumps(config)}")
+    results = run(args.benchmarks or list(BENCHMARKS), options)
+    report = {"config": config, "results": results}
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    status = 1 if any("error" in summary for summary in results.values()) else 0
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        mismatched = {key for key in ("real_models", "feed", "frame_size", "frames", "slots", "records", "machine")
+                      if baseline["config"].get(key) != config.get(key)}
+        if mismatched:
+            print(f"Warning: baseline was recorded with a different config ({', '.join(sorted(mismatched))})")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for name, metric, before, after, change in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.2f} -> {after:.2f} ({change:+.0%})")
+        if regressions:
+            status = 1
+        else:
+            print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
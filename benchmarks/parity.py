@@ -0,0 +1,193 @@
+"""
+Accuracy and latency parity of the ONNX Runtime detector backend against PyTorch.
+
+Run from the repository root on a machine with the real weights, ultralytics and
+onnxruntime installed:
+
+    python -m benchmarks.parity                          # both detectors, FP32 and INT8
+    python -m benchmarks.parity vehicle_detector --precision int8 --threads 4
+
+Both backends see the same inputs: frames of the recorded gate clip for the plate
+detector and the lot images in videos/ for the vehicle detector. Detections above
+--conf are matched one-to-one by IoU within the same class. The exit status is 1 if
+the ONNX model misses or adds more than --min-match allows.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+VIDEOS_DIR = REPO_DIR / "videos"
+PLATE_VIDEO = VIDEOS_DIR / "entry_capture_feed.mp4"
+LOT_IMAGES = [VIDEOS_DIR / "parking_layout_setup.jpg", VIDEOS_DIR / "test_parking.jpg"]
+
+def _plate_frames(count: int) -> list:
+    import cv2
+
+    cap = cv2.VideoCapture(str(PLATE_VIDEO))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+    frames = []
+    # Spread the samples over the whole clip rather than its first second
+    for position in np.linspace(0, max(total - 1, 0), count).astype(int):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, int(position))
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+def _lot_images() -> list:
+    import cv2
+    return [img for img in (cv2.imread(str(path)) for path in LOT_IMAGES) if img is not None]
+
+def _detections(result, conf: float):
+    boxes = result.boxes
+    xyxy = boxes.xyxy.cpu().numpy().astype(np.float64).reshape(-1, 4)
+    scores = boxes.conf.cpu().numpy().reshape(-1)
+    classes = boxes.cls.cpu().numpy().reshape(-1)
+    keep = scores >= conf
+    return xyxy[keep], scores[keep], classes[keep]
+
+def match(reference, candidate, iou_threshold: float):
+    """
+    Greedily pairs reference and candidate detections of the same class, best IoU first.
+
+    Returns:
+        List of (reference index, candidate index, IoU, absolute confidence difference).
+    """
+    from backend.occupancy import iou_matrix
+
+    ref_boxes, ref_scores, ref_classes = reference
+    cand_boxes, cand_scores, cand_classes = candidate
+    if not len(ref_boxes) or not len(cand_boxes):
+        return []
+    ious = iou_matrix(ref_boxes, cand_boxes)
+    ious[ref_classes[:, None] != cand_classes[None, :]] = 0.0
+    pairs = []
+    used_ref, used_cand = set(), set()
+    for flat in np.argsort(ious, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, ious.shape)
+        if ious[i, j] < iou_threshold:
+            break
+        if i in used_ref or j in used_cand:
+            continue
+        used_ref.add(i)
+        used_cand.add(j)
+        pairs.append((int(i), int(j), float(ious[i, j]), abs(float(ref_scores[i]) - float(cand_scores[j]))))
+    return pairs
+
+def _timed_predict(model, inputs: list, imgsz: int, warmup: int):
+    for img in inputs[:warmup]:
+        model(img, verbose=False, imgsz=imgsz)
+    results, latencies = [], []
+    for img in inputs:
+        start = time.perf_counter()
+        results.append(model(img, verbose=False, imgsz=imgsz)[0])
+        latencies.append(time.perf_counter() - start)
+    return results, np.asarray(latencies) * 1000.0
+
+def compare(name: str, inputs: list, precision: str, options: dict) -> dict:
+    """Runs one detector on both backends over `inputs` and summarizes agreement and latency."""
+    from backend import detectors, model_registry
+
+    path = model_registry.DETECTOR_PATHS[name]
+    if options["threads"]:
+        import torch
+        torch.set_num_threads(options["threads"])
+    from ultralytics import YOLO
+    reference_model = YOLO(str(path))
+    candidate_model = detectors.load_onnx(path, precision, threads=options["threads"])
+
+    reference, reference_ms = _timed_predict(reference_model, inputs, options["imgsz"], options["warmup"])
+    candidate, candidate_ms = _timed_predict(candidate_model, inputs, options["imgsz"], options["warmup"])
+
+    expected = found = matched = 0
+    ious, conf_diffs = [], []
+    for ref_result, cand_result in zip(reference, candidate):
+        ref = _detections(ref_result, options["conf"])
+        cand = _detections(cand_result, options["conf"])
+        pairs = match(ref, cand, options["iou"])
+        expected += len(ref[0])
+        found += len(cand[0])
+        matched += len(pairs)
+        ious.extend(pair[2] for pair in pairs)
+        conf_diffs.extend(pair[3] for pair in pairs)
+
+    return {
+        "model": name, "precision": precision, "inputs": len(inputs),
+        "recall": matched / expected if expected else 1.0,  # PyTorch detections the ONNX model also finds
+        "precision_rate": matched / found if found else 1.0,  # ONNX detections PyTorch also finds
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "max_conf_diff": float(np.max(conf_diffs)) if conf_diffs else None,
+        "torch_p50_ms": float(np.percentile(reference_ms, 50)),
+        "onnx_p50_ms": float(np.percentile(candidate_ms, 50)),
+        "speedup": float(np.percentile(reference_ms, 50) / np.percentile(candidate_ms, 50)),
+    }
+
+def _format_row(summary: dict) -> str:
+    if "error" in summary:
+        return f"{summary['model']:<18} {summary['precision']:<5} ERROR {summary['error']}"
+    mean_iou = f"{summary['mean_iou']:.3f}" if summary["mean_iou"] is not None else "-"
+    return (f"{summary['model']:<18} {summary['precision']:<5} recall {summary['recall']:>6.1%}  "
+            f"precision {summary['precision_rate']:>6.1%}  IoU {mean_iou:>5}  "
+            f"torch {summary['torch_p50_ms']:>8.2f} ms  onnx {summary['onnx_p50_ms']:>8.2f} ms  "
+            f"x{summary['speedup']:.2f}")
+
+def main(argv=None) -> int:
+    from backend import detectors
+    from backend.model_registry import DETECTOR_PATHS
+
+    parser = argparse.ArgumentParser(description="Compare the ONNX Runtime detectors against PyTorch.")
+    parser.add_argument("models", nargs="*", metavar="MODEL",
+                        help=f"Detectors to check (default: all): {', '.join(DETECTOR_PATHS)}.")
+    parser.add_argument("--precision", action="append",
+                        help=f"One of {', '.join(detectors.PRECISIONS)}; repeatable (default: both).")
+    parser.add_argument("--frames", type=int, default=50, help="Frames sampled from the gate clip.")
+    parser.add_argument("--imgsz", type=int, default=detectors.DEFAULT_IMGSZ, help="Model input size for both backends.")
+    parser.add_argument("--threads", type=int, help="Inference threads for both backends.")
+    parser.add_argument("--conf", type=float, default=0.5, help="Only detections at or above this confidence are compared.")
+    parser.add_argument("--iou", type=float, default=0.5, help="Minimum IoU for two detections to match.")
+    parser.add_argument("--min-match", type=float, default=0.95, help="Minimum recall and precision to pass.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed calls per backend before timing.")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.models if name not in DETECTOR_PATHS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+    precisions = args.precision or list(detectors.PRECISIONS)
+    unknown = [precision for precision in precisions if precision not in detectors.PRECISIONS]
+    if unknown:
+        parser.error(f"unknown precision(s): {', '.join(unknown)}")
+
+    options = {"imgsz": args.imgsz, "threads": args.threads, "conf": args.conf, "iou": args.iou, "warmup": args.warmup}
+    inputs = {"plate_detector": _plate_frames(args.frames), "vehicle_detector": _lot_images()}
+    print(f"Config: {json.dumps({**options, 'frames': args.frames, 'min_match': args.min_match})}")
+
+    results = []
+    status = 0
+    for name in args.models or list(DETECTOR_PATHS):
+        for precision in precisions:
+            try:
+                if not inputs[name]:
+                    raise RuntimeError(f"No sample inputs found in {VIDEOS_DIR}")
+                summary = compare(name, inputs[name], precision, options)
+            except Exception as e:
+                summary = {"model": name, "precision": precision, "error": str(e)}
+            results.append(summary)
+            print(_format_row(summary), flush=True)
+            if "error" in summary or min(summary["recall"], summary["precision_rate"]) < args.min_match:
+                status = 1
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if status:
+        print(f"FAIL: ONNX detections differ from PyTorch beyond --min-match {args.min_match:.0%}")
+    return status
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(REPO_DIR))
+    sys.exit(main())
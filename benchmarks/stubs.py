@@ -0,0 +1,149 @@
+import json
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# The stubs return the same result objects as the ONNX backend, so both stay in the shape callers expect
+from backend.detectors import Boxes, Result
+
+# Synthetic scenes are drawn in these colors so the stub detectors can find objects with a cheap color mask
+PLATE_COLOR = (255, 255, 255)
+VEHICLE_COLOR = (200, 60, 30)
+STUB_PLATE_TEXT = "KA01AB1234"
+COLOR_TOLERANCE = 24
+
+class StubDetector:
+    def __init__(self, color, cls: int = 0, conf: float = 0.9, scale: float = 0.25, delay_ms: float = 0.0) -> None:
+        """
+        Deterministic stand-in for a YOLO model: returns the bounding boxes of the
+        regions drawn in `color`, found on a downscaled copy of each frame.
+
+        Args:
+            color: BGR color the synthetic scene draws its objects in.
+            cls (int): Class id reported for every box.
+            conf (float): Confidence reported for every box.
+            scale (float): Downscale factor applied before searching the mask.
+            delay_ms (float): Extra time spent per frame, to emulate a heavier model.
+        """
+        # Match within a tolerance, as lossy codecs (MJPG clips, JPEG uploads) shift colors slightly
+        self.lower = np.clip(np.array(color, dtype=np.int16) - COLOR_TOLERANCE, 0, 255).astype(np.uint8)
+        self.upper = np.clip(np.array(color, dtype=np.int16) + COLOR_TOLERANCE, 0, 255).astype(np.uint8)
+        self.cls = cls
+        self.conf = conf
+        self.scale = scale
+        self.delay_ms = delay_ms
+
+    def _detect(self, frame: np.ndarray) -> Result:
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_NEAREST)
+        mask = cv2.inRange(small, self.lower, self.upper)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        rects = [cv2.boundingRect(contour) for contour in contours]
+        xyxy = np.array([[x, y, x + w, y + h] for x, y, w, h in rects if w > 1 and h > 1], dtype=np.float32).reshape(-1, 4)
+        xyxy /= self.scale
+        count = len(xyxy)
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000.0)
+        boxes = Boxes(xyxy, np.full(count, self.conf, dtype=np.float32), np.full(count, self.cls, dtype=np.float32))
+        return Result(boxes, frame.shape[:2])
+
+    def __call__(self, frames, verbose: bool = False, **kwargs) -> List[Result]:
+        if isinstance(frames, np.ndarray):
+            frames = [frames]
+        return [self._detect(frame) for frame in frames]
+
+class StubOCR:
+    def __init__(self, text: str = STUB_PLATE_TEXT, confidence: float = 0.9, delay_ms: float = 0.0) -> None:
+        """Deterministic stand-in for PlateOCR: every non-blank crop reads as `text`."""
+        self.text = text
+        self.confidence = confidence
+        self.delay_ms = delay_ms
+
+    def read(self, image) -> Tuple[str, float]:
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000.0)
+        if image is None or image.size == 0 or not image.any():
+            return "", 0.0
+        return self.text, self.confidence
+
+    def read_batch(self, images, detect: bool = True) -> List[Tuple[str, float]]:
+        return [self.read(image) for image in images]
+
+    def extract_text(self, image) -> str:
+        return self.read(image)[0]
+
+def install(plate_delay_ms: float = 0.0, vehicle_delay_ms: float = 0.0, ocr_delay_ms: float = 0.0) -> None:
+    """Points the model registry of this process at the stubs; nothing heavy is imported."""
+    from backend.model_registry import registry
+    registry.register("plate_detector", lambda: StubDetector(PLATE_COLOR, cls=0, delay_ms=plate_delay_ms))
+    registry.register("plate_ocr", lambda: StubOCR(delay_ms=ocr_delay_ms))
+    registry.register("vehicle_detector", lambda: StubDetector(VEHICLE_COLOR, cls=2, delay_ms=vehicle_delay_ms))
+
+def _background(width: int, height: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Mid-gray noise never matches the stub colors exactly
+    return rng.integers(60, 180, size=(height, width, 3), dtype=np.uint8)
+
+def plate_frame(width: int, height: int, index: int, frames: int, seed: int = 0) -> np.ndarray:
+    """One frame of a plate crossing the view from left to right over `frames` frames."""
+    frame = _background(width, height, seed + index)
+    plate_w, plate_h = max(40, width // 6), max(12, height // 14)
+    x = int((width - plate_w) * index / max(1, frames - 1))
+    y = (height - plate_h) // 2
+    cv2.rectangle(frame, (x, y), (x + plate_w, y + plate_h), PLATE_COLOR, -1)
+    cv2.putText(frame, STUB_PLATE_TEXT, (x + 4, y + plate_h - 4), cv2.FONT_HERSHEY_PLAIN,
+                plate_h / 16.0, (0, 0, 0), 1)
+    return frame
+
+def write_plate_video(path, width: int = 1280, height: int = 720, frames: int = 120, fps: float = 25.0,
+                      seed: int = 0) -> str:
+    """Writes a synthetic gate-camera clip with one plate passing through and returns its path."""
+    path = str(path)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not write synthetic video: {path}")
+    try:
+        for index in range(frames):
+            writer.write(plate_frame(width, height, index, frames, seed))
+    finally:
+        writer.release()
+    return path
+
+def lot_scene(slots: int = 40, width: int = 1280, height: int = 720, occupied_ratio: float = 0.5,
+              seed: int = 0) -> Tuple[np.ndarray, dict]:
+    """
+    A synthetic lot image with `slots` slots on a grid and a matching layout.
+    Every slot is drawn empty or holding a vehicle, deterministically for a given seed.
+
+    Returns:
+        Tuple of (BGR image, layout dict in the parking_layout.json format).
+    """
+    rng = np.random.default_rng(seed)
+    img = _background(width, height, seed)
+    columns = max(1, int(np.ceil(np.sqrt(slots * width / height))))
+    rows = int(np.ceil(slots / columns))
+    cell_w, cell_h = width // columns, height // rows
+    layout = {"slots": []}
+    for index in range(slots):
+        row, column = divmod(index, columns)
+        x1, y1 = column * cell_w + 2, row * cell_h + 2
+        x2, y2 = x1 + cell_w - 4, y1 + cell_h - 4
+        layout["slots"].append({"id": f"slot{index + 1}", "roi": [x1, y1, x2, y2]})
+        cv2.rectangle(img, (x1, y1), (x2, y2), (255, 255, 0), 1)
+        if rng.random() < occupied_ratio:
+            inset_x, inset_y = cell_w // 8, cell_h // 8
+            cv2.rectangle(img, (x1 + inset_x, y1 + inset_y), (x2 - inset_x, y2 - inset_y), VEHICLE_COLOR, -1)
+    return img, layout
+
+def write_lot_scene(directory, slots: int = 40, width: int = 1280, height: int = 720, seed: int = 0) -> Tuple[str, str]:
+    """Writes a synthetic lot image and its layout file; returns (image path, layout path)."""
+    directory = Path(directory)
+    img, layout = lot_scene(slots, width, height, seed=seed)
+    image_path = directory / "lot.png"
+    layout_path = directory / "lot_layout.json"
+    cv2.imwrite(str(image_path), img)
+    with open(layout_path, "w") as f:
+        json.dump(layout, f)
+    return str(image_path), str(layout_path)